@@ -0,0 +1,202 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from . import compression
+
+# Small in-process LRU cache with a per-entry TTL.
+#
+# Every uvicorn worker has its own copy, and invalidation only reaches the
+# worker that handled the write, so the TTL bounds how stale other workers can
+# be. Loaders take a token() before reading and pass it to set(): a value
+# computed from reads that started before an invalidate(), or before an
+# update() of the same key, is dropped instead of being cached.
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._tick = 0
+        # key -> tick of its last update(), oldest first, at most maxsize
+        # keys; ticks dropped from it raise _forgotten instead
+        self._updated = OrderedDict()
+        self._forgotten = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def token(self) -> Tuple[int, int]:
+        with self._lock:
+            return self.generation, self._tick
+
+    def _stale(self, key: Hashable, token: Tuple[int, int]) -> bool:
+        generation, tick = token
+        return (
+            generation != self.generation
+            or tick < self._forgotten
+            or self._updated.get(key, 0) > tick
+        )
+
+    def set(self, key: Hashable, value: Any, token: Optional[Tuple[int, int]] = None):
+        with self._lock:
+            if token is not None and self._stale(key, token):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key: Hashable, fn: Callable[[Any], Any]):
+        # Apply a write to one cached value instead of dropping everything.
+        # Values for this key from reads that started earlier are not cached,
+        # so they cannot overwrite the updated value; other keys are not
+        # affected.
+        with self._lock:
+            self._tick += 1
+            self._updated[key] = self._tick
+            self._updated.move_to_end(key)
+            if len(self._updated) > self.maxsize:
+                _, self._forgotten = self._updated.popitem(last=False)
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data[key] = (entry[0], fn(entry[1]))
+
+    def invalidate(self):
+        with self._lock:
+            self._data.clear()
+            self._updated.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Serialized GET /products/ and /admin/categories/ responses, invalidated by
+# product and category writes (category lists embed product counts)
+catalog_cache = TTLCache(
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+)
+
+# Serialized GET /admin/banners/ responses, invalidated by banner writes
+banner_cache = TTLCache(
+    maxsize=int(os.getenv("BANNER_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("BANNER_CACHE_TTL", "300")),
+)
+
+# Serialized GET /admin/vip/ responses. The revenue figures move with every
+# order, so this relies on a short TTL; VIP level writes invalidate it.
+vip_cache = TTLCache(
+    maxsize=8,
+    ttl=float(os.getenv("VIP_CACHE_TTL", "30")),
+)
+
+# Per-user sets of favorited product ids for POST /favorites/{id}/contains.
+# add/remove_favorite update the user's set in place; product deletes clear it.
+favorite_cache = TTLCache(
+    maxsize=int(os.getenv("FAVORITE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("FAVORITE_CACHE_TTL", "300")),
+)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+def _make_entry(body: bytes, headers: Optional[Dict[str, str]]):
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    # The last item holds the compressed forms of body, filled on first use
+    return body, etag, headers or {}, {}
+
+
+def _respond(request: Request, entry) -> Response:
+    body, etag, headers, compressed = entry
+    headers = {**headers, "Cache-Control": "no-cache"}
+    encoding = compression.choose(request.headers.get("accept-encoding")) if len(body) >= compression.MIN_SIZE else None
+    if compression.ENABLED:
+        headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        if encoding not in compressed:
+            compressed[encoding] = compression.compress(body, encoding)
+        body = compressed[encoding]
+        # Each encoding is a different representation with its own ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = etag
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_json_response(
+    request: Request,
+    cache: TTLCache,
+    key: Hashable,
+    build: Callable[[], Tuple[bytes, Dict[str, str]]],
+) -> Response:
+    # Serve a JSON body from cache with a strong ETag (hash of the body).
+    # build() runs the query and returns (body, extra headers) on a miss.
+    # A matching If-None-Match is answered with 304; when the entry is cached
+    # that costs neither a query nor serialization.
+    entry = cache.get(key)
+    if entry is None:
+        token = cache.token()
+        entry = _make_entry(*build())
+        cache.set(key, entry, token)
+    return _respond(request, entry)
+
+
+async def cached_json_response_async(
+    request: Request,
+    cache: TTLCache,
+    key: Hashable,
+    build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]],
+) -> Response:
+    # Same as cached_json_response for async handlers; build is awaited.
+    entry = cache.get(key)
+    if entry is None:
+        token = cache.token()
+        entry = _make_entry(*await build())
+        cache.set(key, entry, token)
+    return _respond(request, entry)
@@ -0,0 +1,303 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from . import models, schemas, database, loaders
+
+# Write-behind cart store.
+#
+# Each user's cart is loaded once (one query with its products) and kept in
+# memory. Quantity changes and removals only touch the in-memory copy and mark
+# it dirty; a background thread writes the net result to cart_items
+# CART_FLUSH_DELAY seconds after the first pending change, so a burst of +/-
+# clicks becomes a single UPDATE. Adding a product that is not in the cart yet, batch
+# mutations, and checkout write through immediately: new lines need their
+# database id, and checkout (orders.create_order) flushes and holds the cart
+# for the duration of the order transaction.
+#
+# The in-memory copy lives in one worker. With several workers, route a user's
+# requests to the same worker or set CART_FLUSH_DELAY=0, which writes every
+# change through and keeps nothing in memory between requests. Clean carts are
+# dropped after CART_TTL seconds so product data shown in the cart stays fresh.
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY = float(os.getenv("CART_FLUSH_DELAY", "0.5"))
+CART_TTL = float(os.getenv("CART_TTL", "60"))
+
+
+class _Cart:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lines: Optional[Dict[str, schemas.CartItem]] = None  # None until loaded
+        self.persisted: Dict[str, int] = {}  # product_id -> quantity in cart_items
+        # Lines removed in memory whose cart_items row still exists; re-adding
+        # the product reuses the row
+        self.removed: Dict[str, schemas.CartItem] = {}
+        self.dirty_since: Optional[float] = None
+        self.loaded_at = 0.0
+
+
+class CartStore:
+    def __init__(self, flush_delay: float = FLUSH_DELAY, ttl: float = CART_TTL):
+        self.flush_delay = flush_delay
+        self.ttl = ttl
+        self.flushes = 0
+        self.coalesced = 0
+        self._carts: Dict[str, _Cart] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextmanager
+    def _locked(self, user_id: str, load: bool = True):
+        while True:
+            with self._lock:
+                cart = self._carts.setdefault(user_id, _Cart())
+            cart.lock.acquire()
+            # The cart may have been evicted while we waited for it
+            if self._carts.get(user_id) is cart:
+                break
+            cart.lock.release()
+        try:
+            if load and cart.lines is None:
+                self._load(user_id, cart)
+            yield cart
+        finally:
+            cart.lock.release()
+
+    def _evict(self, user_id: str, cart: _Cart):
+        with self._lock:
+            if self._carts.get(user_id) is cart:
+                del self._carts[user_id]
+
+    def _load(self, user_id: str, cart: _Cart):
+        db = database.SessionLocal()
+        try:
+            rows = db.query(models.CartItem).options(*loaders.cart_item_options()).filter(
+                models.CartItem.user_id == user_id
+            ).all()
+            cart.lines = {row.product_id: schemas.CartItem.model_validate(row) for row in rows}
+        finally:
+            db.close()
+        cart.persisted = {product_id: line.quantity for product_id, line in cart.lines.items()}
+        cart.removed = {}
+        cart.dirty_since = None
+        cart.loaded_at = time.monotonic()
+
+    def _write(self, user_id: str, cart: _Cart, db, quantities: Dict[str, int], products: Dict[str, models.Product]):
+        # Bring cart_items in line with quantities inside db's transaction
+        known = {**cart.removed, **cart.lines}
+        removed = [product_id for product_id in cart.persisted if product_id not in quantities]
+        if removed:
+            db.query(models.CartItem).filter(
+                models.CartItem.user_id == user_id,
+                models.CartItem.product_id.in_(removed)
+            ).delete(synchronize_session=False)
+
+        changed = [
+            {"id": known[product_id].id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+            if product_id in known and cart.persisted.get(product_id) != quantity
+        ]
+        if changed:
+            db.bulk_update_mappings(models.CartItem, changed)
+
+        inserted = [
+            models.CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if product_id not in known
+        ]
+        db.add_all(inserted)
+        db.flush()
+
+        lines = {}
+        for product_id, quantity in quantities.items():
+            line = known.get(product_id)
+            lines[product_id] = line.model_copy(update={"quantity": quantity}) if line else None
+        for row in inserted:
+            lines[row.product_id] = schemas.CartItem(
+                id=row.id,
+                product_id=row.product_id,
+                quantity=row.quantity,
+                product=schemas.Product.model_validate(products[row.product_id]),
+            )
+        db.commit()
+
+        cart.lines = lines
+        cart.persisted = dict(quantities)
+        cart.removed = {}
+        cart.dirty_since = None
+        self.flushes += 1
+
+    def _flush(self, user_id: str, cart: _Cart):
+        quantities = {product_id: line.quantity for product_id, line in cart.lines.items()}
+        db = database.SessionLocal()
+        try:
+            self._write(user_id, cart, db, quantities, {})
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _change(self, user_id: str, change: Callable[[Dict[str, int]], None], write_through: bool = False):
+        # change() edits a product_id -> quantity copy of the cart and raises
+        # HTTPException to reject the whole change. Returns the lines before
+        # and after.
+        with self._locked(user_id) as cart:
+            before = cart.lines
+            quantities = {product_id: line.quantity for product_id, line in before.items()}
+            change(quantities)
+            quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+
+            known = {**cart.removed, **before}
+            added = [product_id for product_id in quantities if product_id not in known]
+            if added or write_through or self.flush_delay <= 0:
+                db = database.SessionLocal()
+                try:
+                    products = {}
+                    if added:
+                        products = {
+                            product.id: product
+                            for product in db.query(models.Product).options(*loaders.product_options()).filter(
+                                models.Product.id.in_(added)
+                            )
+                        }
+                        if len(products) < len(added):
+                            raise HTTPException(status_code=404, detail="Product not found")
+                    self._write(user_id, cart, db, quantities, products)
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    db.close()
+                if self.flush_delay <= 0:
+                    self._evict(user_id, cart)
+            else:
+                cart.lines = {
+                    product_id: known[product_id].model_copy(update={"quantity": quantity})
+                    if known[product_id].quantity != quantity else known[product_id]
+                    for product_id, quantity in quantities.items()
+                }
+                cart.removed = {
+                    product_id: line for product_id, line in known.items()
+                    if product_id not in quantities and product_id in cart.persisted
+                }
+                if cart.dirty_since is None:
+                    cart.dirty_since = time.monotonic()
+                else:
+                    self.coalesced += 1
+                self._start()
+            return before, cart.lines
+
+    def items(self, user_id: str) -> List[schemas.CartItem]:
+        with self._locked(user_id) as cart:
+            if self.flush_delay <= 0:
+                self._evict(user_id, cart)
+            return list(cart.lines.values())
+
+    def apply(self, user_id: str, operations: List[schemas.CartOperation], write_through: bool = False) -> Tuple[dict, dict]:
+        def change(quantities):
+            for operation in operations:
+                if operation.op == "add":
+                    quantity = quantities.get(operation.product_id, 0) + operation.quantity
+                    if operation.product_id not in quantities and quantity <= 0:
+                        raise HTTPException(status_code=400, detail="Quantity must be positive")
+                    quantities[operation.product_id] = quantity
+                    continue
+                if operation.product_id not in quantities:
+                    raise HTTPException(status_code=404, detail="Item not found in cart")
+                if operation.op == "update":
+                    quantities[operation.product_id] = operation.quantity
+                else:
+                    del quantities[operation.product_id]
+
+        return self._change(user_id, change, write_through)
+
+    def clear(self, user_id: str):
+        self._change(user_id, lambda quantities: quantities.clear(), write_through=True)
+
+    @contextmanager
+    def checkout(self, user_id: str):
+        # Flush pending changes and hold the cart while the order is created.
+        # The cart is dropped afterwards so the next read sees cart_items.
+        with self._locked(user_id, load=False) as cart:
+            try:
+                if cart.dirty_since is not None:
+                    self._flush(user_id, cart)
+                yield
+            finally:
+                self._evict(user_id, cart)
+
+    def discard(self, user_id: str):
+        # The user's cart rows were changed or deleted outside the store
+        with self._locked(user_id, load=False) as cart:
+            self._evict(user_id, cart)
+
+    def drop_products(self, product_ids: List[str]):
+        # The products (and their cart rows) were deleted
+        product_ids = set(product_ids)
+        with self._lock:
+            carts = list(self._carts.values())
+        for cart in carts:
+            with cart.lock:
+                if cart.lines is None:
+                    continue
+                cart.lines = {pid: line for pid, line in cart.lines.items() if pid not in product_ids}
+                cart.persisted = {pid: qty for pid, qty in cart.persisted.items() if pid not in product_ids}
+
+    def flush_due(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            carts = list(self._carts.items())
+        for user_id, cart in carts:
+            dirty_since = cart.dirty_since
+            if dirty_since is not None and (force or now - dirty_since >= self.flush_delay):
+                with cart.lock:
+                    if cart.dirty_since is None:
+                        continue
+                    try:
+                        self._flush(user_id, cart)
+                    except Exception:
+                        # Stays dirty and is retried on the next pass
+                        logger.exception("Failed to flush cart of user %s", user_id)
+            elif dirty_since is None and now - cart.loaded_at >= self.ttl:
+                with cart.lock:
+                    if cart.dirty_since is None:
+                        self._evict(user_id, cart)
+
+    def flush_all(self):
+        self.flush_due(force=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            carts = list(self._carts.values())
+        return {
+            "carts": len(carts),
+            "dirty": sum(1 for cart in carts if cart.dirty_since is not None),
+            "flushes": self.flushes,
+            "coalesced_writes": self.coalesced,
+            "flush_delay": self.flush_delay,
+        }
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="cart-flusher", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush_all)
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.flush_delay / 2, 0.05))
+            self.flush_due()
+
+
+store = CartStore()
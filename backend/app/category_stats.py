@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, database, counters
+
+# Denormalized product count per category (category_stats table).
+#
+# Product create, category change, delete, batch delete and CSV import add to
+# the affected rows in the same transaction as the product write, so the
+# admin category list and the dashboard category chart read one row per
+# category instead of grouping the products table. reconcile() recounts from
+# products and applies the difference; a background thread runs it at startup
+# and every CATEGORY_RECONCILE_INTERVAL seconds (0 disables the thread) to
+# repair drift from writes that bypass the API.
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = float(os.getenv("CATEGORY_RECONCILE_INTERVAL", "3600"))
+
+
+def add_counts(db: Session, deltas: Dict[str, int]):
+    for category, delta in sorted(deltas.items()):
+        if category and delta:
+            counters.add(db, models.CategoryStats.__table__, {"category": category}, {"product_count": delta})
+
+
+def record_product(db: Session, category: Optional[str]):
+    add_counts(db, {category: 1})
+
+
+def move_product(db: Session, old_category: Optional[str], new_category: Optional[str]):
+    if old_category != new_category:
+        add_counts(db, {old_category: -1, new_category: 1})
+
+
+def remove_product(db: Session, category: Optional[str]):
+    add_counts(db, {category: -1})
+
+
+def remove_products(db: Session, product_ids: Iterable[str]):
+    # Call before deleting the products
+    removed = db.query(models.Product.category, func.count(models.Product.id)).filter(
+        models.Product.id.in_(list(product_ids))
+    ).group_by(models.Product.category)
+    add_counts(db, {category: -count for category, count in removed})
+
+
+def record_products(db: Session, categories: Iterable[Optional[str]]):
+    add_counts(db, Counter(categories))
+
+
+def counts(db: Session) -> Dict[str, int]:
+    return {
+        category: count
+        for category, count in db.query(models.CategoryStats.category, models.CategoryStats.product_count)
+    }
+
+
+def reconcile(db: Session) -> int:
+    # Adds (actual - stored) rather than overwriting, so increments committed
+    # by concurrent product writes are kept. Returns the categories fixed.
+    stored = counts(db)
+    actual = dict(db.query(models.Product.category, func.count(models.Product.id)).filter(
+        models.Product.category.isnot(None)
+    ).group_by(models.Product.category).all())
+    deltas = {
+        category: actual.get(category, 0) - stored.get(category, 0)
+        for category in set(stored) | set(actual)
+    }
+    deltas = {category: delta for category, delta in deltas.items() if delta}
+    add_counts(db, deltas)
+    db.query(models.CategoryStats).filter(models.CategoryStats.product_count <= 0).delete(synchronize_session=False)
+    db.commit()
+    return len(deltas)
+
+
+def _run():
+    while True:
+        db = database.SessionLocal()
+        try:
+            fixed = reconcile(db)
+            if fixed:
+                logger.warning("Category counters drifted for %d categories, corrected", fixed)
+        except Exception:
+            db.rollback()
+            logger.exception("Category counter reconcile failed")
+        finally:
+            db.close()
+        time.sleep(RECONCILE_INTERVAL)
+
+
+_thread = None
+
+
+def start_reconciler():
+    global _thread
+    if _thread is None and RECONCILE_INTERVAL > 0:
+        _thread = threading.Thread(target=_run, name="category-stats-reconcile", daemon=True)
+        _thread.start()
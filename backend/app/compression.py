@@ -0,0 +1,169 @@
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Response compression.
+#
+# CompressionMiddleware gzips (or, with the brotli package installed,
+# brotli-encodes) responses whose Content-Type is in COMPRESSION_TYPES and
+# whose body is at least COMPRESSION_MIN_SIZE bytes, for clients that accept
+# it. Streamed responses (the CSV/NDJSON exports) are compressed as they are
+# sent, and each chunk is flushed so the client receives rows as they are
+# produced rather than when the compressor's buffer fills. Only 200
+# responses without a Content-Range are compressed; errors, redirects and
+# partial content pass through as they are. Responses that already have a Content-Encoding pass through
+# unchanged: cache.py compresses cached JSON bodies once per encoding and
+# keeps them in the cache entry, so repeated hits are not recompressed.
+#
+# COMPRESSION_TYPES lists media types; an entry ending in "/" matches the
+# whole family (text/ matches text/csv, text/plain, ...).
+
+ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+BROTLI_ENABLED = brotli is not None and os.getenv("COMPRESSION_BROTLI", "true").lower() in ("1", "true", "yes")
+CONTENT_TYPES = tuple(
+    media_type.strip().lower()
+    for media_type in os.getenv(
+        "COMPRESSION_TYPES", "application/json,application/x-ndjson,text/,image/svg+xml"
+    ).split(",")
+    if media_type.strip()
+)
+
+
+def allowed(content_type: Optional[str]) -> bool:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return any(
+        media_type.startswith(allowed_type) if allowed_type.endswith("/") else media_type == allowed_type
+        for allowed_type in CONTENT_TYPES
+    )
+
+
+def choose(accept_encoding: Optional[str]) -> Optional[str]:
+    # The encoding to use for a request's Accept-Encoding, or None
+    if not ENABLED or not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if BROTLI_ENABLED and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+        self._encoding = encoding
+
+    def compress(self, chunk: bytes) -> bytes:
+        # Sync-flushed so every chunk can be decoded as soon as it arrives
+        if self._encoding == "br":
+            return self._compress(chunk) + self._compressor.flush()
+        return self._compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self._encoding == "br" else self._compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    message["status"] != 200
+                    or "content-range" in headers
+                    or "content-encoding" in headers
+                    or not allowed(headers.get("content-type"))
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows whether the
+                    # response is streamed and how large it is
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    passthrough = True
+                    if len(body) >= MIN_SIZE:
+                        body = compress(body, encoding)
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                stream = _StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                await send(start)
+
+            body = stream.compress(body) if body else b""
+            if not more_body:
+                body += stream.finish()
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
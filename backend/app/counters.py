@@ -0,0 +1,38 @@
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+# Atomic "add to counter columns, creating the row if missing", used by the
+# denormalized counter tables (daily_sales, user_stats, ...). It runs in the
+# caller's transaction so counters commit or roll back with the write that
+# changed them.
+
+
+def add(db: Session, table, key: dict, deltas: dict, columns=None):
+    # key: primary key values; deltas: column -> amount to add. columns lists
+    # every counter column so a new row starts with zeros for the others.
+    values = {name: deltas.get(name, 0) for name in (columns or deltas)}
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(**key, **values)
+        stmt = stmt.on_duplicate_key_update(
+            {name: table.c[name] + stmt.inserted[name] for name in deltas}
+        )
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(table).values(**key, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[name] for name in key],
+            set_={name: table.c[name] + stmt.excluded[name] for name in deltas},
+        )
+    else:
+        conditions = [table.c[name] == value for name, value in key.items()]
+        updated = db.execute(
+            table.update().where(*conditions).values(
+                {name: table.c[name] + value for name, value in deltas.items()}
+            )
+        )
+        if updated.rowcount:
+            return
+        stmt = table.insert().values(**key, **values)
+    db.execute(stmt)
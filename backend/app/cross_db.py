@@ -0,0 +1,123 @@
+import os
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from . import models, database, loaders, pagination
+
+# Batched lookups across the marketplace and admin databases.
+#
+# Orders live in the marketplace database and shippings in the admin
+# database, so they cannot be joined in SQL. A BatchLoader collects the keys
+# a request needs (want()) and fetches all of them with one IN query per
+# database the first time a value is read, then serves repeats from its
+# per-request cache.
+#
+# The combined admin lists page over the side they sort by. When they also
+# filter on the other database, scan_page() walks the sorted side in
+# SCAN_BATCH-row keyset batches and checks each batch against the other
+# database with one IN query over that batch's ids (matching_ids), until the
+# page is full. No query ever carries more than one batch of ids, and the
+# total is not counted (it is None; clients follow next_cursor).
+
+IN_CHUNK_SIZE = 1000
+SCAN_BATCH = int(os.getenv("CROSS_DB_SCAN_BATCH", "500"))
+
+
+class BatchLoader:
+    def __init__(self, fetch: Callable[[List[Hashable]], Iterable[Tuple[Hashable, object]]]):
+        # fetch(keys) returns (key, value) pairs for the keys that exist
+        self._fetch = fetch
+        self._cache: Dict[Hashable, object] = {}
+        self._pending: Dict[Hashable, None] = {}
+        self.queries = 0
+
+    def want(self, keys: Iterable[Hashable]):
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending[key] = None
+
+    def prime(self, key: Hashable, value):
+        self._cache[key] = value
+        self._pending.pop(key, None)
+
+    def load_many(self, keys: List[Hashable]) -> list:
+        self.want(keys)
+        self._dispatch()
+        return [self._cache.get(key) for key in keys]
+
+    def load(self, key: Hashable):
+        return self.load_many([key])[0]
+
+    def _dispatch(self):
+        pending = list(self._pending)
+        self._pending.clear()
+        for start in range(0, len(pending), IN_CHUNK_SIZE):
+            chunk = pending[start:start + IN_CHUNK_SIZE]
+            found = dict(self._fetch(chunk))
+            self.queries += 1
+            for key in chunk:
+                self._cache[key] = found.get(key)
+
+
+class CrossLoaders:
+    def __init__(self, db: Session, db_admin: Session):
+        # Orders by id (with everything schemas.Order needs) and shippings
+        # by order id
+        self.orders = BatchLoader(lambda ids: (
+            (order.id, order)
+            for order in db.query(models.Order).options(*loaders.order_options()).filter(models.Order.id.in_(ids))
+        ))
+        self.shippings = BatchLoader(lambda ids: (
+            (shipping.order_id, shipping)
+            for shipping in db_admin.query(models.Shipping).filter(models.Shipping.order_id.in_(ids))
+        ))
+
+
+def get_loaders(
+    db: Session = Depends(database.get_db),
+    db_admin: Session = Depends(database.get_admin_db),
+) -> CrossLoaders:
+    # Shares the request's sessions with the route's own db dependencies
+    return CrossLoaders(db, db_admin)
+
+
+def matching_ids(session: Session, id_column, ids: List[Hashable], conditions: list) -> set:
+    # The ids that have a row passing conditions in session's database
+    if not ids:
+        return set()
+    return {value for (value,) in session.query(id_column).filter(id_column.in_(ids), *conditions)}
+
+
+def scan_page(
+    query,
+    order: pagination.Ordering,
+    skip: int,
+    limit: int,
+    cursor: Optional[str],
+    keep: Callable[[list], set],
+):
+    # Like pagination.paginate() for a filter that cannot be written in SQL
+    # against query's database: keep(items) returns the keepable items of a
+    # batch (by identity or key). Returns (items, next_cursor).
+    wanted = limit + 1 + (0 if cursor else skip)
+    matched = []
+    position = cursor
+    while len(matched) < wanted:
+        batch = pagination.fetch_page(query, order, 0, SCAN_BATCH, position)
+        if not batch:
+            break
+        kept = keep([item for item, _ in batch])
+        matched.extend((item, key) for item, key in batch if item in kept)
+        if len(batch) < SCAN_BATCH:
+            break
+        position = pagination.encode_cursor(batch[-1][1])
+
+    if not cursor:
+        matched = matched[skip:]
+    next_cursor = None
+    if len(matched) > limit:
+        matched = matched[:limit]
+        next_cursor = pagination.encode_cursor(matched[-1][1])
+    return [item for item, _ in matched], next_cursor
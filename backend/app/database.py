@@ -1,29 +1,65 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from .pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool, pool_settings
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root@localhost/pet_marketplace")
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    **pool_settings("DB_")
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the read-heavy routers. Defaults to the same database as
+# DATABASE_URL through the matching async driver.
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_settings("ASYNC_DB_")
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Admin Database Config
 SQLALCHEMY_ADMIN_DATABASE_URL = os.getenv("ADMIN_DATABASE_URL", "mysql+pymysql://root@localhost/pet_marketplace_admin")
 
 admin_engine = create_engine(
-    SQLALCHEMY_ADMIN_DATABASE_URL
+    SQLALCHEMY_ADMIN_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    **pool_settings("ADMIN_DB_")
 )
 SessionLocalAdmin = sessionmaker(autocommit=False, autoflush=False, bind=admin_engine)
 
 Base = declarative_base()
 AdminBase = declarative_base()
 
+def pool_stats():
+    # Pool usage per engine, for sizing pools against uvicorn workers
+    return {
+        "main": engine.pool.stats(),
+        "main_async": async_engine.pool.stats(),
+        "admin": admin_engine.pool.stats(),
+    }
+
 def get_db():
     db = SessionLocal()
     try:
@@ -31,6 +67,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_admin_db():
     db = SessionLocalAdmin()
     try:
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterator
+
+from fastapi.responses import StreamingResponse
+
+from . import database
+
+# Streaming CSV / NDJSON export.
+#
+# The statement runs on its own session with yield_per, which makes SQLAlchemy
+# use a server-side cursor (an unbuffered SSCursor on PyMySQL), so rows arrive
+# from MySQL in batches and each batch is written out and discarded. Memory
+# stays flat however many rows are exported. Statements should select plain
+# columns rather than ORM entities so no identity map builds up.
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_batch(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_value(v) for v in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_batch(columns, rows) -> bytes:
+    lines = [
+        json.dumps({c: _value(v) for c, v in zip(columns, row)}, ensure_ascii=False)
+        for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def stream_rows(statement, fmt: str, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    db = database.SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        if fmt == "csv":
+            # BOM so Excel opens the Chinese text correctly; the importer
+            # reads utf-8-sig as well
+            yield "\ufeff".encode("utf-8") + _csv_batch([columns])
+        for rows in result.partitions():
+            yield _csv_batch(rows) if fmt == "csv" else _ndjson_batch(columns, rows)
+    finally:
+        db.close()
+
+
+def export_response(statement, name: str, fmt: str) -> StreamingResponse:
+    filename = f"{name}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    return StreamingResponse(
+        stream_rows(statement, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,90 @@
+from functools import lru_cache
+from typing import Annotated, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, computed_field, create_model
+
+from . import schemas, image_variants
+
+# Sparse fieldsets for product listings: ?fields=id,name,price,image,sales.
+#
+# parse() turns the parameter into a selection of schemas.Product fields (id
+# is always included). loaders.py uses the selection to load only those
+# product columns (load_only) and to skip the images/specs queries unless
+# they were asked for; the schemas built here read and serialize only the
+# selected fields, so unloaded columns are never touched. Without fields=
+# the endpoints return the full schemas.Product as before.
+
+PRODUCT_FIELDS = (*schemas.Product.model_fields, *schemas.Product.model_computed_fields)
+
+# The ORM relationships hold objects; the schema lists their url/spec
+_COLLECTION_TYPES = {
+    "images": Annotated[List[str], BeforeValidator(schemas.Product._extract_images)],
+    "specs": Annotated[List[str], BeforeValidator(schemas.Product._extract_specs)],
+}
+
+
+def parse(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    if not fields:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(PRODUCT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    names.add("id")
+    return tuple(name for name in PRODUCT_FIELDS if name in names)
+
+
+class _ProductFields(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+class _ImageVariants(BaseModel):
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[Dict[str, str]]:
+        return image_variants.variant_urls(self.image)
+
+
+class _ImagesVariants(BaseModel):
+    @computed_field
+    @property
+    def images_variants(self) -> List[Optional[Dict[str, str]]]:
+        return [image_variants.variant_urls(url) for url in self.images]
+
+
+# Computed field -> (the field it is derived from, hidden field definition,
+# mixin adding the computed field). The source field is read but not
+# returned unless it was selected too.
+_COMPUTED = {
+    "image_variants": ("image", (Optional[str], Field(default=None, exclude=True)), _ImageVariants),
+    "images_variants": ("images", (_COLLECTION_TYPES["images"], Field(default=[], exclude=True)), _ImagesVariants),
+}
+
+
+@lru_cache(maxsize=256)
+def product_schema(selection: Tuple[str, ...]):
+    definitions = {}
+    for name, info in schemas.Product.model_fields.items():
+        if name in selection:
+            definitions[name] = (_COLLECTION_TYPES.get(name, info.annotation), info)
+    bases = [_ProductFields]
+    for name, (source, hidden, mixin) in _COMPUTED.items():
+        if name in selection:
+            definitions.setdefault(source, hidden)
+            bases.append(mixin)
+    return create_model("ProductFields", __base__=tuple(bases), **definitions)
+
+
+@lru_cache(maxsize=256)
+def with_product(schema, selection: Tuple[str, ...]):
+    # schema (CartItem, Favorite, OrderItem) with its product narrowed
+    return create_model(f"{schema.__name__}Fields", __base__=schema, product=(product_schema(selection), ...))
+
+
+@lru_cache(maxsize=256)
+def order_schema(selection: Tuple[str, ...]):
+    return create_model(
+        "OrderFields", __base__=schemas.Order,
+        items=(List[with_product(schemas.OrderItem, selection)], []),
+    )
@@ -0,0 +1,179 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from . import upload_store
+
+try:
+    from PIL import Image
+except ImportError:  # Without Pillow no variants are generated
+    Image = None
+
+# Responsive renditions of product images.
+#
+# After a product image is stored, schedule() hands it to a process pool that
+# writes three renditions next to the original in the upload store:
+#
+#   <sha256>_thumb.<ext>    at most THUMB_SIZE px wide, for listing cards
+#   <sha256>_medium.<ext>   at most MEDIUM_SIZE px wide, for detail pages
+#   <sha256>_webp.webp      the image as WebP, at most LARGE_SIZE px wide
+#
+# The request that uploaded the image does not wait for this. variant_urls()
+# derives the URLs from the image URL alone, and /media serves the original
+# (with a short cache lifetime) until a rendition exists, so clients can use
+# them immediately. Unsplash images (the seed data) get the same sizes through
+# Unsplash's own w= and fm= parameters. Other URLs have no variants.
+#
+# The pool's worker processes are started and shut down with the app (the
+# lifespan in main.py), so the first upload does not spawn them on the event
+# loop.
+#
+# Gallery images are uploaded the same way, so schemas.Product returns
+# renditions for them too (images_variants).
+#
+# Pillow is listed in requirements.txt. If it is missing, schedule() does
+# nothing and the variant URLs fall back to the originals.
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = int(os.getenv("IMAGE_THUMB_SIZE", "320"))
+MEDIUM_SIZE = int(os.getenv("IMAGE_MEDIUM_SIZE", "800"))
+LARGE_SIZE = int(os.getenv("IMAGE_LARGE_SIZE", "1600"))
+WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+VARIANTS = ("thumb", "medium", "webp")
+
+
+def variant_key(key: str, variant: str) -> str:
+    digest, extension = os.path.splitext(key)
+    return f"{digest}_{variant}{'.webp' if variant == 'webp' else extension}"
+
+
+def original_key(key: str) -> Optional[str]:
+    # The original's key for a variant key, or None if key is not a variant
+    digest, extension = os.path.splitext(key)
+    if "_" not in digest:
+        return None
+    digest, variant = digest.split("_", 1)
+    if variant not in VARIANTS:
+        return None
+    if variant == "webp":
+        # The original may have any image extension
+        for candidate in upload_store.IMAGE_EXTENSIONS:
+            if os.path.exists(upload_store.path_for(digest + candidate)):
+                return digest + candidate
+        return None
+    return digest + extension
+
+
+def _unsplash_url(url: str, **params) -> str:
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+@lru_cache(maxsize=8192)
+def variant_urls(image: Optional[str]) -> Optional[Dict[str, str]]:
+    # Computed for every serialized product, so results are memoized per URL;
+    # callers must not modify the returned dict
+    if not image:
+        return None
+    media_prefix = f"{upload_store.PUBLIC_BASE_URL}/media/"
+    if image.startswith(media_prefix):
+        key = image[len(media_prefix):]
+        if not upload_store.KEY_RE.match(key):
+            return None
+        return {variant: media_prefix + variant_key(key, variant) for variant in VARIANTS}
+    if urlsplit(image).hostname == "images.unsplash.com":
+        return {
+            "thumb": _unsplash_url(image, w=str(THUMB_SIZE)),
+            "medium": _unsplash_url(image, w=str(MEDIUM_SIZE)),
+            "webp": _unsplash_url(image, w=str(LARGE_SIZE), fm="webp"),
+        }
+    return None
+
+
+def _save(image, path: str, **options):
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    image.save(temp_path, **options)
+    os.replace(temp_path, path)
+
+
+def _resized(image, width: int):
+    if image.width <= width:
+        return image
+    copy = image.copy()
+    copy.thumbnail((width, width * 10), Image.LANCZOS)
+    return copy
+
+
+def generate(key: str):
+    # Runs in the worker processes
+    source = upload_store.path_for(key)
+    with Image.open(source) as image:
+        image.load()
+        image_format = image.format
+        sizes = {"thumb": THUMB_SIZE, "medium": MEDIUM_SIZE, "webp": LARGE_SIZE}
+        for variant in VARIANTS:
+            path = upload_store.path_for(variant_key(key, variant))
+            if os.path.exists(path):
+                continue
+            rendition = _resized(image, sizes[variant])
+            if variant == "webp":
+                if rendition.mode not in ("RGB", "RGBA"):
+                    alpha = "A" in rendition.mode or "transparency" in rendition.info
+                    rendition = rendition.convert("RGBA" if alpha else "RGB")
+                _save(rendition, path, format="WEBP", quality=80)
+            elif image_format == "JPEG":
+                _save(rendition.convert("RGB"), path, format="JPEG", quality=85, optimize=True)
+            else:
+                _save(rendition, path, format=image_format)
+
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+def start():
+    # The first submit starts all the spawn workers
+    if Image is not None and WORKERS > 0:
+        _pool().submit(os.getpid).result()
+
+
+def shutdown():
+    # Waits for queued renditions to be written
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _log_failure(key: str, future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Generating image variants for %s failed: %s", key, error)
+
+
+def schedule(key: str):
+    if Image is None or WORKERS <= 0:
+        return
+    future = _pool().submit(generate, key)
+    future.add_done_callback(lambda f: _log_failure(key, f))
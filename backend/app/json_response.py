@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import List
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+# Opt-in fast path for large JSON responses.
+#
+# By default FastAPI validates a route's return value against its
+# response_model and then walks it with jsonable_encoder before json.dumps,
+# so rows the route already turned into schema objects are validated and
+# converted twice. A route that returns FastJSONResponse skips both steps:
+# validate_many() builds the schema objects from ORM rows in one pass, and
+# render() serializes the content (dicts and lists of schema objects,
+# datetimes, ...) straight to bytes with pydantic-core. The route's
+# response_model is still used for the OpenAPI docs.
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def validate_many(schema, rows) -> list:
+    return _list_adapter(schema).validate_python(rows, from_attributes=True)
+
+
+def dump_many(schema, rows) -> bytes:
+    # validate_many + serialization, for bodies that are cached as bytes
+    adapter = _list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
@@ -0,0 +1,57 @@
+from sqlalchemy.orm import Load, joinedload, selectinload
+
+from . import models
+
+# Eager-loading strategies for the serializers in schemas.py.
+#
+# Many-to-one hops (item -> product, order -> user) are joined into the parent
+# query; collections (product images/specs, order items) are fetched with one
+# SELECT ... WHERE parent_id IN (...) each. The number of queries per endpoint
+# is therefore fixed no matter how many rows are returned, and there is no
+# images x specs cartesian product.
+#
+# The fields argument is a fieldsets.parse() selection: only those product
+# columns are loaded, and images/specs only when selected. None loads the
+# full schemas.Product.
+
+
+def _product_collections(loader, fields=None):
+    if fields is None:
+        return [
+            loader.selectinload(models.Product.images),
+            loader.selectinload(models.Product.specs),
+        ]
+    columns = {name for name in fields if name in models.Product.__table__.c}
+    if "image_variants" in fields:
+        columns.add("image")
+    options = [loader.load_only(*(getattr(models.Product, name) for name in sorted(columns)))]
+    if "images" in fields or "images_variants" in fields:
+        options.append(loader.selectinload(models.Product.images))
+    if "specs" in fields:
+        options.append(loader.selectinload(models.Product.specs))
+    return options
+
+
+def product_options(fields=None):
+    # For schemas.Product
+    return _product_collections(Load(models.Product), fields)
+
+
+def cart_item_options(fields=None):
+    # For schemas.CartItem
+    return _product_collections(joinedload(models.CartItem.product), fields)
+
+
+def favorite_options(fields=None):
+    # For schemas.Favorite
+    return _product_collections(joinedload(models.Favorite.product), fields)
+
+
+def order_options(fields=None):
+    # For schemas.Order: user (with VIP level) and items with their products
+    return [
+        joinedload(models.Order.user).joinedload(models.User.vip_level),
+        *_product_collections(
+            selectinload(models.Order.items).joinedload(models.OrderItem.product), fields
+        ),
+    ]
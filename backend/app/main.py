@@ -1,12 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from . import models, database
-from .routers import products, users, cart, favorites, orders, admin, admin_products, admin_categories, admin_orders, admin_shipping, admin_users, admin_vip, admin_dashboard, admin_banners
+from . import models, database, category_stats, compression, image_variants
+from .routers import products, users, cart, favorites, orders, admin, admin_products, admin_categories, admin_orders, admin_shipping, admin_users, admin_vip, admin_dashboard, admin_banners, media
 
 models.Base.metadata.create_all(bind=database.engine)
 models.AdminBase.metadata.create_all(bind=database.admin_engine)
 
-app = FastAPI()
+# Recount category_stats now and then periodically
+category_stats.start_reconciler()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Image variant worker processes live as long as the app
+    image_variants.start()
+    yield
+    image_variants.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for frontend
 origins = [
@@ -21,8 +32,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# gzip/brotli for JSON and text responses; see app/compression.py
+if compression.ENABLED:
+    app.add_middleware(compression.CompressionMiddleware)
+
 app.include_router(products.router)
 app.include_router(users.router)
 app.include_router(cart.router)
@@ -37,6 +53,7 @@ app.include_router(admin_users.router)
 app.include_router(admin_vip.router)
 app.include_router(admin_dashboard.router)
 app.include_router(admin_banners.router)
+app.include_router(media.router)
 
 from fastapi.staticfiles import StaticFiles
 import os
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, Boolean, DateTime, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base, AdminBase
 from datetime import datetime
@@ -14,7 +14,7 @@ class User(Base):
     username = Column(String(50), unique=True, index=True)
     email = Column(String(100), unique=True, index=True)
     password = Column(String(255))
-    phone = Column(String(20))
+    phone = Column(String(20), index=True)
     avatar = Column(String(255))
     role = Column(String(20), default="user")
     is_active = Column(Boolean, default=True)
@@ -55,6 +55,7 @@ class AdminUser(AdminBase):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (Index("ix_products_sales_id", "sales", "id"),)
 
     id = Column(String(36), primary_key=True, default=generate_uuid)
     name = Column(String(100), index=True)
@@ -88,6 +89,16 @@ class ProductSpec(Base):
     
     product = relationship("Product", back_populates="specs")
 
+class ProductSearchTerm(Base):
+    __tablename__ = "product_search_terms"
+    # Covering index: a term lookup never has to touch the table rows
+    __table_args__ = (Index("ix_product_search_terms_term_product", "term", "product_id", "weight"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    term = Column(String(32))
+    product_id = Column(String(36), ForeignKey("products.id"), index=True)
+    weight = Column(Integer, default=1)
+
 class Address(Base):
     __tablename__ = "addresses"
     
@@ -105,6 +116,11 @@ class Address(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    # Keyset pagination indexes for the admin order list sort options
+    __table_args__ = (
+        Index("ix_orders_create_time_id", "create_time", "id"),
+        Index("ix_orders_total_amount_id", "total_amount", "id"),
+    )
     
     id = Column(String(36), primary_key=True, default=generate_uuid)
     order_number = Column(String(50), unique=True, index=True)
@@ -118,6 +134,10 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     items = relationship("OrderItem", back_populates="order")
 
+    # Orders in any other status count as paid in the order totals
+    # (app/order_stats.py)
+    UNPAID_STATUSES = ("pending", "cancelled")
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     
@@ -132,6 +152,8 @@ class OrderItem(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    # One row per product in a user's cart
+    __table_args__ = (UniqueConstraint("user_id", "product_id", name="uq_cart_items_user_product"),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(36), ForeignKey("users.id"))
@@ -162,6 +184,45 @@ class SearchHistory(Base):
     
     user = relationship("User", back_populates="search_history")
 
+class OrderWorkerLease(Base):
+    __tablename__ = "order_worker_leases"
+
+    # Order number worker ids leased by app/order_numbers.py
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(100))
+    heartbeat = Column(DateTime)
+
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+
+    # Up to ROLLUP_SLOTS rows per UTC day, maintained by app/rollup.py and
+    # summed on read
+    day = Column(Date, primary_key=True)
+    slot = Column(Integer, primary_key=True, autoincrement=False, default=0)
+    order_count = Column(Integer, default=0)
+    sales_amount = Column(Float, default=0.0)
+    paid_count = Column(Integer, default=0)
+    paid_amount = Column(Float, default=0.0)
+    new_users = Column(Integer, default=0)
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    # Denormalized per-user order totals, maintained by app/user_stats.py
+    user_id = Column(String(36), ForeignKey("users.id"), primary_key=True)
+    orders_count = Column(Integer, default=0, index=True)
+    total_spent = Column(Float, default=0.0, index=True)
+    paid_count = Column(Integer, default=0)
+    paid_spent = Column(Float, default=0.0)
+
+class CategoryStats(Base):
+    __tablename__ = "category_stats"
+
+    # Denormalized product count per category name, maintained by
+    # app/category_stats.py
+    category = Column(String(50), primary_key=True)
+    product_count = Column(Integer, default=0)
+
 class Category(AdminBase):
     __tablename__ = "categories"
 
@@ -195,3 +256,16 @@ class Banner(AdminBase):
     sort_order = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
     create_time = Column(DateTime, default=datetime.utcnow)
+
+class ProductImportJob(AdminBase):
+    __tablename__ = "product_import_jobs"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    filename = Column(String(255))
+    status = Column(String(20), default="pending") # pending, running, completed, failed
+    processed_rows = Column(Integer, default=0)
+    created_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(Text) # JSON list of the first errors
+    create_time = Column(DateTime, default=datetime.utcnow)
+    finish_time = Column(DateTime, nullable=True)
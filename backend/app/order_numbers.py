@@ -0,0 +1,168 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from . import models, database
+
+# Snowflake-style order numbers: "PET" + a 63-bit integer made of
+#
+#   41 bits  milliseconds since EPOCH_MS (about 69 years)
+#   10 bits  worker id (0-1023)
+#   12 bits  per-millisecond sequence (4096 ids/ms per worker)
+#
+# Numbers are generated in process with no database round trip, are unique
+# across workers as long as every worker has its own id, and increase
+# monotonically within a worker. When a millisecond's sequence runs out, or
+# the wall clock steps backwards, the generator moves on to the next logical
+# millisecond instead of waiting, so it never blocks and never repeats. The
+# creation time (to the millisecond) can be read back from the high bits.
+#
+# Worker ids must be unique among running processes. Set ORDER_WORKER_ID
+# per process if the deployment assigns ids itself. Otherwise each process
+# leases a free id from the order_worker_leases table and renews the lease
+# every ORDER_WORKER_LEASE_TTL / 4 seconds. A lease not renewed for
+# ORDER_WORKER_LEASE_TTL seconds may be taken over by another process, so a
+# process stops numbering orders (and leases a new id) once its own lease is
+# older than half the TTL. Host clocks must agree to well within the TTL.
+
+logger = logging.getLogger(__name__)
+
+EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+PREFIX = "PET"
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+
+LEASE_TTL = float(os.getenv("ORDER_WORKER_LEASE_TTL", "60"))
+
+
+class WorkerLease:
+    def __init__(self, ttl: float = LEASE_TTL):
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.worker_id = None
+        self._valid_until = 0.0
+        self._thread = None
+
+    def _claim(self, db) -> int:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.ttl)
+        leases = {worker_id: heartbeat for worker_id, heartbeat in db.query(
+            models.OrderWorkerLease.worker_id, models.OrderWorkerLease.heartbeat
+        )}
+        for worker_id in range(MAX_WORKER_ID + 1):
+            if worker_id not in leases:
+                try:
+                    db.add(models.OrderWorkerLease(worker_id=worker_id, owner=self.owner, heartbeat=now))
+                    db.commit()
+                    return worker_id
+                except IntegrityError:
+                    db.rollback()
+            elif leases[worker_id] is None or leases[worker_id] < stale:
+                # Take over an expired lease unless someone else just did
+                taken = db.query(models.OrderWorkerLease).filter(
+                    models.OrderWorkerLease.worker_id == worker_id,
+                    models.OrderWorkerLease.heartbeat == leases[worker_id],
+                ).update({"owner": self.owner, "heartbeat": now}, synchronize_session=False)
+                db.commit()
+                if taken:
+                    return worker_id
+        raise RuntimeError("No free order number worker id")
+
+    def _renew(self, db) -> bool:
+        renewed = db.query(models.OrderWorkerLease).filter(
+            models.OrderWorkerLease.worker_id == self.worker_id,
+            models.OrderWorkerLease.owner == self.owner,
+        ).update({"heartbeat": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return bool(renewed)
+
+    def current(self) -> int:
+        # The leased worker id, renewing or replacing the lease if needed
+        if self.worker_id is not None and time.monotonic() < self._valid_until:
+            return self.worker_id
+        started = time.monotonic()
+        db = database.SessionLocal()
+        try:
+            if self.worker_id is None or not self._renew(db):
+                self.worker_id = self._claim(db)
+                logger.info("Leased order number worker id %d", self.worker_id)
+        finally:
+            db.close()
+        self._valid_until = started + self.ttl / 2
+        self._start()
+        return self.worker_id
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-worker-lease", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.ttl / 4)
+            started = time.monotonic()
+            db = database.SessionLocal()
+            try:
+                if self._renew(db):
+                    self._valid_until = started + self.ttl / 2
+            except Exception:
+                db.rollback()
+                logger.exception("Renewing the order number worker lease failed")
+            finally:
+                db.close()
+
+
+class OrderNumberGenerator:
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        now = time.time_ns() // 1_000_000 - EPOCH_MS
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self) -> str:
+        # Zero-padded so string order matches numeric order
+        return f"{PREFIX}{self.next_id():019d}"
+
+
+generator = None
+lease = None
+_init_lock = threading.Lock()
+
+
+def next_order_number() -> str:
+    global generator, lease
+    with _init_lock:
+        if os.getenv("ORDER_WORKER_ID") is not None:
+            if generator is None:
+                generator = OrderNumberGenerator(int(os.getenv("ORDER_WORKER_ID")))
+        else:
+            if lease is None:
+                lease = WorkerLease()
+            worker_id = lease.current()
+            if generator is None or generator.worker_id != worker_id:
+                generator = OrderNumberGenerator(worker_id)
+    return generator.next()
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from . import models, rollup, user_stats
+
+# Order totals kept per user (app/user_stats.py) and in the daily rollup
+# (app/rollup.py).
+#
+# An order counts as paid in every status except Order.UNPAID_STATUSES, the
+# same rule both rebuild() functions use, and its payment is counted on the
+# order's creation day. Status changes go through change_status(), which adds
+# the payment when an order becomes paid and takes it off again when it stops
+# being paid, so orders.pay, the admin status update and order deletion all
+# agree with a rebuild whatever the order of statuses.
+#
+# Callers make these calls last in their transaction, after any other row
+# locks, so the shared rollup rows are held for as short a time as possible.
+# The user's row is always written before the rollup row, so two
+# transactions never take them in opposite orders.
+
+
+def is_paid(status: Optional[str]) -> bool:
+    return status not in models.Order.UNPAID_STATUSES
+
+
+def _add_payment(db: Session, order: models.Order, count: int):
+    user_stats.add_payment(db, order.user_id, count, order.total_amount)
+    rollup.add_payment(db, count, order.total_amount, order.create_time)
+
+
+def record_order(db: Session, order: models.Order):
+    user_stats.record_order(db, order.user_id, order.total_amount)
+    rollup.record_order(db, order.total_amount, order.create_time)
+    if is_paid(order.status):
+        _add_payment(db, order, 1)
+
+
+def change_status(db: Session, order: models.Order, status: str):
+    if is_paid(order.status) != is_paid(status):
+        _add_payment(db, order, 1 if is_paid(status) else -1)
+    order.status = status
+
+
+def remove_order(db: Session, order: models.Order):
+    user_stats.remove_order(db, order.user_id, order.total_amount)
+    rollup.remove_order(db, order.total_amount, order.create_time)
+    if is_paid(order.status):
+        _add_payment(db, order, -1)
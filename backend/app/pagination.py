@@ -0,0 +1,129 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Numeric, and_, cast, false, or_, true
+
+# Keyset (cursor) pagination.
+#
+# An ordering is a list of (column expression, descending) pairs whose last
+# entry is unique (the primary key), so every row has a distinct position.
+# The cursor is the sort key of the last row on the page, and the next page
+# is "rows strictly after that key" - no OFFSET scan and no COUNT needed.
+# NULLs are treated as the smallest value, matching MySQL's ordering.
+
+Ordering = Sequence[Tuple[Any, bool]]
+
+
+def _encode_value(value):
+    # JSON-safe form of a sort key; the non-JSON types are tagged so that
+    # decode_cursor() can restore them. MySQL returns SUM() as Decimal.
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        return [_decode_value(v) for v in values]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def exact(column, scale: int = 2):
+    # FLOAT columns (money) do not compare equal to the value read back, so
+    # rows at a page boundary would repeat or be skipped. Sorting on the
+    # value cast to DECIMAL makes the cursor round-trip exactly.
+    return cast(column, Numeric(20, scale)).label(None)
+
+
+def _after(column, descending: bool, value):
+    if value is None:
+        return false() if descending else column.isnot(None)
+    if descending:
+        return or_(column < value, column.is_(None))
+    return column > value
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def after_condition(order: Ordering, values: Sequence[Any]):
+    # (k1, k2, ..., kn) > (v1, v2, ..., vn) expanded into
+    # k1 > v1 OR (k1 = v1 AND k2 > v2) OR ... so mixed directions work.
+    clauses = []
+    prefix = []
+    for (column, descending), value in zip(order, values):
+        clauses.append(and_(*prefix, _after(column, descending, value)))
+        prefix.append(_equal(column, value))
+    return or_(*clauses) if clauses else true()
+
+
+def fetch_page(query, order: Ordering, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    # Up to limit rows after the cursor (or skip rows), each paired with its
+    # sort key for encode_cursor()
+    columns = [column for column, _ in order]
+    entities = len(query.column_descriptions)
+
+    query = query.order_by(None).order_by(
+        *[column.desc() if descending else column.asc() for column, descending in order]
+    )
+    if cursor:
+        query = query.filter(after_condition(order, decode_cursor(cursor, len(order))))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.add_columns(*columns).limit(limit).all()
+
+    # Strip the sort columns; single-entity queries return plain objects
+    if entities == 1:
+        return [(row[0], list(row[entities:])) for row in rows]
+    return [(tuple(row[:entities]), list(row[entities:])) for row in rows]
+
+
+def paginate(query, order: Ordering, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    # Returns (items, next_cursor). With a cursor the page starts after it and
+    # skip is ignored; otherwise classic OFFSET paging is used. Either way the
+    # returned cursor continues from the last row, so clients can switch to
+    # cursor mode after the first page.
+    page = fetch_page(query, order, skip, limit + 1, cursor)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1][1])
+
+    return [item for item, _ in page], next_cursor
@@ -0,0 +1,78 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+# bcrypt hashing and verification off the request threadpool.
+#
+# Each bcrypt call burns tens of milliseconds of CPU. The async helpers below
+# run it in a pool of PASSWORD_WORKERS processes, so a burst of logins uses
+# those cores and leaves the event loop and the threadpool free for every
+# other endpoint. At most PASSWORD_MAX_PENDING calls may be queued or running;
+# beyond that callers get a 503 with Retry-After instead of an ever-growing
+# queue. PASSWORD_WORKERS=0 runs the work in the threadpool instead.
+#
+# This module must not import the database modules: the pool's worker
+# processes import it to unpickle the task functions.
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(max(WORKERS, 1) * 16)))
+
+
+def get_password_hash(password):
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # spawn: forking a process that already runs threads is unsafe
+                _executor = ProcessPoolExecutor(
+                    max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _executor
+
+
+async def _run(fn, *args):
+    global _pending
+    with _lock:
+        if _pending >= MAX_PENDING:
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+        _pending += 1
+    try:
+        if WORKERS <= 0:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.wrap_future(_pool().submit(fn, *args))
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+def stats() -> dict:
+    return {"workers": WORKERS, "max_pending": MAX_PENDING, "pending": _pending}
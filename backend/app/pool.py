@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Connection pool configuration and instrumentation.
+#
+# Pool settings come from the environment, e.g. DB_POOL_SIZE for the
+# marketplace database and ADMIN_DB_POOL_SIZE for the admin database. An
+# engine-specific variable falls back to the DB_* one, then to the default:
+#
+#   *_POOL_SIZE      connections kept open                 (default 5)
+#   *_MAX_OVERFLOW   extra connections allowed under load  (default 10)
+#   *_POOL_TIMEOUT   seconds to wait for a free connection (default 30)
+#   *_POOL_RECYCLE   seconds before a connection is replaced, keep this below
+#                    MySQL's wait_timeout                  (default 1800)
+#   *_POOL_PRE_PING  test connections on checkout          (default true)
+
+DEFAULTS = {
+    "POOL_SIZE": "5",
+    "MAX_OVERFLOW": "10",
+    "POOL_TIMEOUT": "30",
+    "POOL_RECYCLE": "1800",
+    "POOL_PRE_PING": "true",
+}
+
+
+def _env(prefix: str, name: str) -> str:
+    return os.getenv(f"{prefix}{name}") or os.getenv(f"DB_{name}") or DEFAULTS[name]
+
+
+def pool_settings(prefix: str = "DB_") -> dict:
+    return {
+        "pool_size": int(_env(prefix, "POOL_SIZE")),
+        "max_overflow": int(_env(prefix, "MAX_OVERFLOW")),
+        "pool_timeout": float(_env(prefix, "POOL_TIMEOUT")),
+        "pool_recycle": int(_env(prefix, "POOL_RECYCLE")),
+        "pool_pre_ping": _env(prefix, "POOL_PRE_PING").lower() in ("1", "true", "yes"),
+    }
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_time_total += wait
+            self.wait_time_max = max(self.wait_time_max, wait)
+
+
+class _InstrumentedPoolMixin:
+    # Times every checkout, including any wait for a free connection and the
+    # pre-ping. An overflow event is a checkout that had to open a connection
+    # beyond pool_size.
+
+    @property
+    def metrics(self) -> PoolMetrics:
+        if "_metrics" not in self.__dict__:
+            self._metrics = PoolMetrics()
+        return self._metrics
+
+    def connect(self):
+        overflow_before = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        overflowed = self._overflow > max(overflow_before, 0)
+        self.metrics.record_checkout(time.perf_counter() - start, overflowed)
+        return connection
+
+    def stats(self) -> dict:
+        metrics = self.metrics
+        attempts = metrics.checkouts + metrics.timeouts
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": metrics.checkouts,
+            "wait_time_total": metrics.wait_time_total,
+            "wait_time_max": metrics.wait_time_max,
+            "wait_time_avg": metrics.wait_time_total / attempts if attempts else 0.0,
+            "overflow_events": metrics.overflow_events,
+            "timeouts": metrics.timeouts,
+        }
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from fastapi import UploadFile
+
+from . import models, database, search, cache, category_stats
+
+# Streaming CSV product import.
+#
+# The upload is spooled to a temporary file in fixed-size chunks, then parsed
+# row by row with the csv module (so quoted commas work) and inserted in
+# chunks of CHUNK_SIZE products. Ids are generated client-side, so a chunk is
+# a handful of executemany INSERTs (products, images, specs, search terms)
+# with no flush per row. If a chunk fails to insert, its rows are retried one
+# by one so the error can be reported against the offending line.
+#
+# Expected columns: name,category,price,stock,description,image_url,
+# additional_images,specs (the last two are "|"-separated). The first row is
+# a header.
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed_rows = 0
+        self.created_count = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+
+    def add_error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+async def save_upload(file: UploadFile) -> str:
+    # Copy the upload to a temporary file without reading it into memory
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "wb") as buffer:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer.write(chunk)
+    return path
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split("|") if part.strip()] if value else []
+
+
+def _parse_row(parts: List[str]):
+    if len(parts) < 4:
+        raise ValueError("Insufficient fields")
+
+    parts = [part.strip() for part in parts] + [""] * (8 - len(parts))
+    product = {
+        "id": models.generate_uuid(),
+        "name": parts[0],
+        "category": parts[1],
+        "price": float(parts[2]),
+        "stock": int(parts[3]),
+        "description": parts[4],
+        "image": parts[5],
+        "sales": 0,
+        "rating": 0,
+        "status": "上架",
+    }
+    return product, _split(parts[6]), _split(parts[7])
+
+
+def _insert_rows(db, rows):
+    products, images, specs, terms = [], [], [], []
+    for _, (product, product_images, product_specs) in rows:
+        products.append(product)
+        images.extend({"product_id": product["id"], "url": url} for url in product_images)
+        specs.extend({"product_id": product["id"], "spec": spec} for spec in product_specs)
+        terms.extend(search.term_rows(product["id"], product["name"], product["description"]))
+
+    db.bulk_insert_mappings(models.Product, products)
+    if images:
+        db.bulk_insert_mappings(models.ProductImage, images)
+    if specs:
+        db.bulk_insert_mappings(models.ProductSpec, specs)
+    if terms:
+        db.bulk_insert_mappings(models.ProductSearchTerm, terms)
+    category_stats.record_products(db, (product["category"] for product in products))
+
+
+def _insert_chunk(db, chunk, result: ImportResult):
+    try:
+        _insert_rows(db, chunk)
+        db.commit()
+        result.created_count += len(chunk)
+    except Exception:
+        db.rollback()
+        # Find the bad rows
+        for line, row in chunk:
+            try:
+                _insert_rows(db, [(line, row)])
+                db.commit()
+                result.created_count += 1
+            except Exception as e:
+                db.rollback()
+                result.add_error(f"Line {line}: {str(e)}")
+    cache.catalog_cache.invalidate()
+
+
+def run_import(
+    path: str,
+    progress: Optional[Callable[[ImportResult], None]] = None,
+    result: Optional[ImportResult] = None,
+) -> ImportResult:
+    result = result or ImportResult()
+    db = database.SessionLocal()
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Skip header
+
+            chunk = []
+            for parts in reader:
+                if not any(part.strip() for part in parts):
+                    continue
+                result.processed_rows += 1
+                try:
+                    chunk.append((reader.line_num, _parse_row(parts)))
+                except Exception as e:
+                    result.add_error(f"Line {reader.line_num}: {str(e)}")
+
+                if len(chunk) >= CHUNK_SIZE:
+                    _insert_chunk(db, chunk, result)
+                    chunk = []
+                    if progress:
+                        progress(result)
+
+            if chunk:
+                _insert_chunk(db, chunk, result)
+    finally:
+        db.close()
+    return result
+
+
+def _update_job(job_id: str, result: ImportResult, status: str, finished: bool = False):
+    db = database.SessionLocalAdmin()
+    try:
+        job = db.query(models.ProductImportJob).filter(models.ProductImportJob.id == job_id).first()
+        if not job:
+            return
+        job.status = status
+        job.processed_rows = result.processed_rows
+        job.created_count = result.created_count
+        job.error_count = result.error_count
+        job.errors = json.dumps(result.errors, ensure_ascii=False)
+        if finished:
+            job.finish_time = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_job(job_id: str, path: str):
+    # Background task: import the file and record progress on the job row
+    # after every chunk so the admin UI can poll it.
+    result = ImportResult()
+    _update_job(job_id, result, "running")
+    try:
+        run_import(path, progress=lambda r: _update_job(job_id, r, "running"), result=result)
+        _update_job(job_id, result, "completed", finished=True)
+    except Exception as e:
+        result.add_error(f"Import failed: {str(e)}")
+        _update_job(job_id, result, "failed", finished=True)
+    finally:
+        os.remove(path)
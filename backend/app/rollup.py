@@ -0,0 +1,97 @@
+import os
+import random
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, counters
+
+# Daily sales/orders/users rollup for the admin dashboard.
+#
+# The write paths add to the current UTC day's counters in their own
+# transaction: order creation (order_count, sales_amount), user registration
+# (new_users) and order/user deletion (negative deltas). Payments (paid_count,
+# paid_amount) go through app/order_stats.py and are counted on the order's
+# creation day. The dashboard then reads the rollup instead of aggregating the
+# orders table. rebuild() recomputes everything from the source tables.
+#
+# Each day is split over ROLLUP_SLOTS rows and every write picks one at
+# random, so concurrent checkouts rarely wait on the same row lock; readers
+# sum the slots.
+
+COUNTERS = ("order_count", "sales_amount", "paid_count", "paid_amount", "new_users")
+SLOTS = max(1, int(os.getenv("ROLLUP_SLOTS", "16")))
+
+
+def _day(when: Optional[datetime]) -> date:
+    return (when or datetime.utcnow()).date()
+
+
+def _upsert(db: Session, day: date, deltas: dict):
+    counters.add(
+        db, models.DailySales.__table__, {"day": day, "slot": random.randrange(SLOTS)}, deltas, COUNTERS
+    )
+
+
+def record_order(db: Session, amount: float, when: Optional[datetime] = None):
+    _upsert(db, _day(when), {"order_count": 1, "sales_amount": amount or 0.0})
+
+
+def remove_order(db: Session, amount: float, when: Optional[datetime] = None):
+    _upsert(db, _day(when), {"order_count": -1, "sales_amount": -(amount or 0.0)})
+
+
+def add_payment(db: Session, count: int, amount: float, when: Optional[datetime] = None):
+    # count is +1 when an order becomes paid and -1 when it stops being paid
+    _upsert(db, _day(when), {"paid_count": count, "paid_amount": count * (amount or 0.0)})
+
+
+def record_user(db: Session, when: Optional[datetime] = None):
+    _upsert(db, _day(when), {"new_users": 1})
+
+
+def remove_user(db: Session, when: Optional[datetime] = None):
+    _upsert(db, _day(when), {"new_users": -1})
+
+
+def _as_date(value) -> date:
+    # func.date() returns a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rebuild(db: Session) -> int:
+    # Backfill from orders and users. Orders count as paid on their creation
+    # day, the same as the live counters.
+    days = {}
+
+    def row(day):
+        return days.setdefault(_as_date(day), {name: 0 for name in COUNTERS})
+
+    order_day = func.date(models.Order.create_time)
+    for day, count, amount in db.query(
+        order_day, func.count(models.Order.id), func.sum(models.Order.total_amount)
+    ).filter(models.Order.create_time.isnot(None)).group_by(order_day):
+        row(day).update(order_count=count, sales_amount=amount or 0.0)
+
+    for day, count, amount in db.query(
+        order_day, func.count(models.Order.id), func.sum(models.Order.total_amount)
+    ).filter(
+        models.Order.create_time.isnot(None),
+        models.Order.status.notin_(models.Order.UNPAID_STATUSES),
+    ).group_by(order_day):
+        row(day).update(paid_count=count, paid_amount=amount or 0.0)
+
+    user_day = func.date(models.User.register_time)
+    for day, count in db.query(user_day, func.count(models.User.id)).filter(
+        models.User.register_time.isnot(None)
+    ).group_by(user_day):
+        row(day).update(new_users=count)
+
+    db.query(models.DailySales).delete(synchronize_session=False)
+    db.bulk_insert_mappings(
+        models.DailySales, [{"day": day, "slot": 0, **counters} for day, counters in days.items()]
+    )
+    db.commit()
+    return len(days)
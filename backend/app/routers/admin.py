@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from .. import models, schemas, database
-from .users import get_password_hash, verify_password
+from starlette.concurrency import run_in_threadpool
+from .. import models, schemas, database, passwords
 from datetime import datetime
 
 router = APIRouter(
@@ -10,13 +10,10 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-@router.post("/register", response_model=schemas.AdminUser)
-def register_admin(user: schemas.AdminUserCreate, db: Session = Depends(database.get_admin_db)):
-    db_user = db.query(models.AdminUser).filter(models.AdminUser.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = get_password_hash(user.password)
+def _email_registered(db: Session, email: str) -> bool:
+    return db.query(models.AdminUser.id).filter(models.AdminUser.email == email).first() is not None
+
+def _create_admin(db: Session, user: schemas.AdminUserCreate, hashed_password: str):
     db_user = models.AdminUser(
         username=user.username,
         email=user.email,
@@ -28,19 +25,40 @@ def register_admin(user: schemas.AdminUserCreate, db: Session = Depends(database
     db.refresh(db_user)
     return db_user
 
+@router.post("/register", response_model=schemas.AdminUser)
+async def register_admin(user: schemas.AdminUserCreate, db: Session = Depends(database.get_admin_db)):
+    if await run_in_threadpool(_email_registered, db, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await passwords.hash_password(user.password)
+    return await run_in_threadpool(_create_admin, db, user, hashed_password)
+
+def _find_admin(db: Session, identifier: str):
+    # Look up by the indexed column the identifier looks like, falling back
+    # to the other one, instead of an OR across both
+    columns = [models.AdminUser.email, models.AdminUser.username]
+    if "@" not in identifier:
+        columns.reverse()
+    for column in columns:
+        db_user = db.query(models.AdminUser).filter(column == identifier).first()
+        if db_user:
+            return db_user
+    return None
+
+def _record_login(db: Session, db_user):
+    db_user.last_login = datetime.utcnow()
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
 @router.post("/login", response_model=schemas.AdminUser)
-def login_admin(user: schemas.AdminUserLogin, db: Session = Depends(database.get_admin_db)):
-    db_user = db.query(models.AdminUser).filter(
-        (models.AdminUser.email == user.identifier) | (models.AdminUser.username == user.identifier)
-    ).first()
+async def login_admin(user: schemas.AdminUserLogin, db: Session = Depends(database.get_admin_db)):
+    db_user = await run_in_threadpool(_find_admin, db, user.identifier)
     
     if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect username/email or password")
-    if not verify_password(user.password, db_user.password):
+    if not await passwords.check_password(user.password, db_user.password):
         raise HTTPException(status_code=400, detail="Incorrect username/email or password")
     
     # Update last login
-    db_user.last_login = datetime.utcnow()
-    db.commit()
-        
-    return db_user
+    return await run_in_threadpool(_record_login, db, db_user)
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, cache
 
 router = APIRouter(
     prefix="/admin/banners",
@@ -9,20 +9,32 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+from pydantic import TypeAdapter
+
+banner_list_adapter = TypeAdapter(List[schemas.Banner])
+
 @router.get("/", response_model=List[schemas.Banner])
 def read_banners(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(database.get_admin_db)
 ):
-    banners = db.query(models.Banner).order_by(models.Banner.sort_order).offset(skip).limit(limit).all()
-    return banners
+    def build():
+        banners = db.query(models.Banner).order_by(models.Banner.sort_order).offset(skip).limit(limit).all()
+        body = banner_list_adapter.dump_json(
+            banner_list_adapter.validate_python(banners, from_attributes=True)
+        )
+        return body, {}
+        
+    return cache.cached_json_response(request, cache.banner_cache, ("banners", skip, limit), build)
 
 @router.post("/", response_model=schemas.Banner)
 def create_banner(banner: schemas.BannerCreate, db: Session = Depends(database.get_admin_db)):
     db_banner = models.Banner(**banner.dict())
     db.add(db_banner)
     db.commit()
+    cache.banner_cache.invalidate()
     db.refresh(db_banner)
     return db_banner
 
@@ -37,6 +49,7 @@ def update_banner(banner_id: int, banner: schemas.BannerUpdate, db: Session = De
         setattr(db_banner, key, value)
         
     db.commit()
+    cache.banner_cache.invalidate()
     db.refresh(db_banner)
     return db_banner
 
@@ -48,4 +61,5 @@ def delete_banner(banner_id: int, db: Session = Depends(database.get_admin_db)):
     
     db.delete(db_banner)
     db.commit()
+    cache.banner_cache.invalidate()
     return {"message": "Banner deleted successfully"}
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, cache, category_stats
 
 router = APIRouter(
     prefix="/admin/categories",
@@ -9,28 +9,34 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-from sqlalchemy import func
+from pydantic import TypeAdapter
+
+category_list_adapter = TypeAdapter(List[schemas.Category])
 
 @router.get("/", response_model=List[schemas.Category])
 def read_categories(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(database.get_admin_db),
     db_main: Session = Depends(database.get_db)
 ):
-    categories = db.query(models.Category).order_by(models.Category.sort_order).offset(skip).limit(limit).all()
-    
-    # Calculate product counts
-    product_counts = db_main.query(
-        models.Product.category, func.count(models.Product.id)
-    ).group_by(models.Product.category).all()
-    
-    counts_map = {name: count for name, count in product_counts}
-    
-    for cat in categories:
-        cat.productCount = counts_map.get(cat.name, 0)
+    def build():
+        categories = db.query(models.Category).order_by(models.Category.sort_order).offset(skip).limit(limit).all()
+        
+        # Product counts are kept per category by category_stats
+        counts_map = category_stats.counts(db_main)
+        
+        for cat in categories:
+            cat.productCount = counts_map.get(cat.name, 0)
+            
+        body = category_list_adapter.dump_json(
+            category_list_adapter.validate_python(categories, from_attributes=True)
+        )
+        return body, {}
         
-    return categories
+    # Product counts change with the catalog, so this shares the catalog cache
+    return cache.cached_json_response(request, cache.catalog_cache, ("categories", skip, limit), build)
 
 @router.post("/", response_model=schemas.Category)
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(database.get_admin_db)):
@@ -41,6 +47,7 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(data
     db_category = models.Category(**category.dict())
     db.add(db_category)
     db.commit()
+    cache.catalog_cache.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -62,6 +69,7 @@ def update_category(category_id: int, category: schemas.CategoryUpdate, db: Sess
         setattr(db_category, key, value)
         
     db.commit()
+    cache.catalog_cache.invalidate()
     db.refresh(db_category)
     return db_category
 
@@ -73,4 +81,5 @@ def delete_category(category_id: int, db: Session = Depends(database.get_admin_d
     
     db.delete(db_category)
     db.commit()
+    cache.catalog_cache.invalidate()
     return {"message": "Category deleted successfully"}
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime
 from .. import models, database
-import calendar
+from sqlalchemy.orm import joinedload, selectinload
 
 router = APIRouter(
     prefix="/admin/dashboard",
@@ -13,62 +13,62 @@ router = APIRouter(
 )
 
 @router.get("/stats")
-def get_dashboard_stats(db: Session = Depends(database.get_db)):
-    # 1. Total Sales
-    total_sales = db.query(func.sum(models.Order.total_amount)).scalar() or 0.0
+async def get_dashboard_stats(db: AsyncSession = Depends(database.get_async_db)):
+    # Sales, order and user totals come from the daily rollup (one row per
+    # day) rather than scanning orders and users
+    totals = (await db.execute(select(
+        func.sum(models.DailySales.sales_amount),
+        func.sum(models.DailySales.order_count),
+        func.sum(models.DailySales.paid_amount),
+        func.sum(models.DailySales.new_users),
+    ))).one()
     
-    # 2. Order Count
-    order_count = db.query(models.Order).count()
-    
-    # 3. User Count
-    user_count = db.query(models.User).count()
-    
-    # 4. Product Count
-    product_count = db.query(models.Product).count()
-    
-    # Calculate changes (Mock logic for now, or simple comparison)
-    # For real implementation, we would query previous month's data
+    # Product Count
+    product_count = await db.scalar(select(func.count()).select_from(models.Product))
     
     return {
-        "total_sales": total_sales,
-        "order_count": order_count,
-        "user_count": user_count,
+        "total_sales": totals[0] or 0.0,
+        "order_count": totals[1] or 0,
+        "paid_sales": totals[2] or 0.0,
+        "user_count": totals[3] or 0,
         "product_count": product_count
     }
 
 @router.get("/sales-chart")
-def get_sales_chart(db: Session = Depends(database.get_db)):
-    # Get last 6 months
-    today = datetime.utcnow()
-    data = []
+async def get_sales_chart(months: int = Query(6, ge=1, le=36), db: AsyncSession = Depends(database.get_async_db)):
+    # Last N calendar months, summed from the daily rollup
+    today = datetime.utcnow().date()
+    month_starts = []
+    year, month = today.year, today.month
+    for _ in range(months):
+        month_starts.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    month_starts.reverse()
     
-    for i in range(5, -1, -1):
-        # Calculate start and end of the month
-        # This is a bit simplified, ideally use a proper date library or SQL grouping
-        month_date = today - timedelta(days=i*30) 
-        year = month_date.year
-        month = month_date.month
-        
-        _, last_day = calendar.monthrange(year, month)
-        start_date = datetime(year, month, 1)
-        end_date = datetime(year, month, last_day, 23, 59, 59)
-        
-        monthly_sales = db.query(func.sum(models.Order.total_amount)).filter(
-            models.Order.create_time >= start_date,
-            models.Order.create_time <= end_date
-        ).scalar() or 0.0
-        
-        data.append({
-            "name": f"{month}月",
-            "销售额": monthly_sales
-        })
-        
-    return data
+    first_year, first_month = month_starts[0]
+    rows = (await db.execute(
+        select(models.DailySales.day, models.DailySales.sales_amount)
+        .where(models.DailySales.day >= date(first_year, first_month, 1))
+    )).all()
+    
+    totals = {key: 0.0 for key in month_starts}
+    for day, amount in rows:
+        key = (day.year, day.month)
+        if key in totals:
+            totals[key] += amount or 0.0
+            
+    return [
+        {"name": f"{month}月", "销售额": totals[(year, month)]}
+        for year, month in month_starts
+    ]
 
 @router.get("/category-chart")
-def get_category_chart(db: Session = Depends(database.get_db)):
-    # Group products by category
-    results = db.query(models.Product.category, func.count(models.Product.id)).group_by(models.Product.category).all()
+async def get_category_chart(db: AsyncSession = Depends(database.get_async_db)):
+    # Product counts are kept per category by category_stats
+    results = (await db.execute(
+        select(models.CategoryStats.category, models.CategoryStats.product_count)
+        .where(models.CategoryStats.product_count > 0)
+    )).all()
     
     data = []
     for category, count in results:
@@ -80,9 +80,17 @@ def get_category_chart(db: Session = Depends(database.get_db)):
             
     return data
 
+@router.get("/db-pools")
+def get_db_pool_stats():
+    # Connection pool metrics of this worker
+    return database.pool_stats()
+
 @router.get("/recent-orders")
-def get_recent_orders(db: Session = Depends(database.get_db)):
-    orders = db.query(models.Order).order_by(models.Order.create_time.desc()).limit(5).all()
+async def get_recent_orders(db: AsyncSession = Depends(database.get_async_db)):
+    orders = (await db.scalars(select(models.Order).options(
+        joinedload(models.Order.user),
+        selectinload(models.Order.items).joinedload(models.OrderItem.product)
+    ).order_by(models.Order.create_time.desc()).limit(5))).all()
     
     result = []
     for order in orders:
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, false
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import models, schemas, database
-from sqlalchemy import desc
+from .. import models, schemas, database, pagination, loaders, export, order_stats, cross_db
+from ..json_response import FastJSONResponse, validate_many
 
 router = APIRouter(
     prefix="/admin/orders",
@@ -10,6 +11,14 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Every ordering ends with id so cursor positions are unique. The default
+# sorts by create_time desc.
+ORDER_SORTS = {
+    None: [(models.Order.create_time, True), (models.Order.id, True)],
+    "amount_desc": [(pagination.exact(models.Order.total_amount), True), (models.Order.id, True)],
+    "amount_asc": [(pagination.exact(models.Order.total_amount), False), (models.Order.id, False)],
+}
+
 @router.get("/", response_model=dict)
 def read_orders(
     skip: int = 0, 
@@ -17,9 +26,10 @@ def read_orders(
     status: Optional[str] = None,
     order_number: Optional[str] = None,
     sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db)
 ):
-    query = db.query(models.Order)
+    query = db.query(models.Order).options(*loaders.order_options())
     
     if status and status != "all":
         query = query.filter(models.Order.status == status)
@@ -27,35 +37,142 @@ def read_orders(
     if order_number:
         query = query.filter(models.Order.order_number.like(f"%{order_number}%"))
         
-    if sort_by == 'amount_desc':
-        query = query.order_by(desc(models.Order.total_amount))
-    elif sort_by == 'amount_asc':
-        query = query.order_by(models.Order.total_amount)
-    else:
-        # Default sort by create_time desc
-        query = query.order_by(desc(models.Order.create_time))
+    order = ORDER_SORTS.get(sort_by, ORDER_SORTS[None])
         
     try:
-        total = query.count()
-        orders = query.offset(skip).limit(limit).all()
+        # Cursor mode skips the COUNT over the filtered set
+        total = None if cursor else query.count()
+        orders, next_cursor = pagination.paginate(query, order, skip, limit, cursor)
         
-        # Explicitly convert to Pydantic models to ensure serialization works
-        # and to catch any validation errors here
-        items = [schemas.Order.from_orm(o) for o in orders]
+        # Validated once here and serialized without a second pass; any
+        # validation error is still caught below
+        items = validate_many(schemas.Order, orders)
         
-        return {
+        return FastJSONResponse({
             "total": total,
             "items": items,
-            "page": skip // limit + 1,
-            "size": limit
-        }
+            "page": None if cursor else skip // limit + 1,
+            "size": limit,
+            "next_cursor": next_cursor
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching orders: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
+@router.get("/export")
+def export_orders(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    status: Optional[str] = None,
+    order_number: Optional[str] = None,
+):
+    # Streams one row per order; see app/export.py
+    statement = select(
+        models.Order.id,
+        models.Order.order_number,
+        models.Order.user_id,
+        models.User.username,
+        models.Order.payment_method,
+        models.Order.total_amount,
+        models.Order.status,
+        models.Order.create_time,
+        models.Order.address_snapshot,
+    ).outerjoin(models.User, models.User.id == models.Order.user_id)
+    
+    if status and status != "all":
+        statement = statement.where(models.Order.status == status)
+        
+    if order_number:
+        statement = statement.where(models.Order.order_number.like(f"%{order_number}%"))
+        
+    return export.export_response(statement.order_by(models.Order.create_time.desc()), "orders", fmt)
+
+# Sorts on shipping fields page over the shippings table instead of orders
+SHIPPING_SORTS = {
+    "shipping_time_desc": [(models.Shipping.shipping_time, True), (models.Shipping.id, True)],
+    "shipping_time_asc": [(models.Shipping.shipping_time, False), (models.Shipping.id, False)],
+}
+
+@router.get("/with-shipping", response_model=dict)
+def read_orders_with_shipping(
+    skip: int = 0,
+    limit: int = 10,
+    status: Optional[str] = None,
+    order_number: Optional[str] = None,
+    shipping_status: Optional[str] = None,
+    carrier: Optional[str] = None,
+    has_shipping: Optional[bool] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    db_admin: Session = Depends(database.get_admin_db),
+    batch: cross_db.CrossLoaders = Depends(cross_db.get_loaders)
+):
+    # Orders with their shipping record. A filter on the other database is
+    # checked one scanned batch at a time (see app/cross_db.py); the page's
+    # other half is fetched with one IN query.
+    order_conditions = []
+    if status and status != "all":
+        order_conditions.append(models.Order.status == status)
+    if order_number:
+        order_conditions.append(models.Order.order_number.like(f"%{order_number}%"))
+        
+    shipping_conditions = []
+    if shipping_status:
+        shipping_conditions.append(models.Shipping.status == shipping_status)
+    if carrier:
+        shipping_conditions.append(models.Shipping.carrier == carrier)
+        
+    if sort_by in SHIPPING_SORTS:
+        # Only orders with a shipping record have a shipping time
+        query = db_admin.query(models.Shipping).filter(*shipping_conditions)
+        if has_shipping is False:
+            query = query.filter(false())
+        if order_conditions:
+            def keep(shippings):
+                ids = cross_db.matching_ids(db, models.Order.id, [s.order_id for s in shippings], order_conditions)
+                return {s for s in shippings if s.order_id in ids}
+            total = None
+            shippings, next_cursor = cross_db.scan_page(query, SHIPPING_SORTS[sort_by], skip, limit, cursor, keep)
+        else:
+            total = None if cursor else query.count()
+            shippings, next_cursor = pagination.paginate(query, SHIPPING_SORTS[sort_by], skip, limit, cursor)
+        orders = batch.orders.load_many([shipping.order_id for shipping in shippings])
+        pairs = [(order, shipping) for order, shipping in zip(orders, shippings) if order is not None]
+    else:
+        order = ORDER_SORTS.get(sort_by, ORDER_SORTS[None])
+        if shipping_conditions or has_shipping is not None:
+            # Scan order ids only; the page's orders are loaded afterwards
+            without_shipping = has_shipping is False and not shipping_conditions
+            def keep(ids):
+                shipped = cross_db.matching_ids(db_admin, models.Shipping.order_id, ids, shipping_conditions)
+                return set(ids) - shipped if without_shipping else shipped
+            query = db.query(models.Order.id).filter(*order_conditions)
+            total = None
+            order_ids, next_cursor = cross_db.scan_page(query, order, skip, limit, cursor, keep)
+            orders = batch.orders.load_many(order_ids)
+        else:
+            query = db.query(models.Order).options(*loaders.order_options()).filter(*order_conditions)
+            total = None if cursor else query.count()
+            orders, next_cursor = pagination.paginate(query, order, skip, limit, cursor)
+        pairs = list(zip(orders, batch.shippings.load_many([order.id for order in orders])))
+        
+    for order, shipping in pairs:
+        order.shipping = shipping
+    items = validate_many(schemas.OrderWithShipping, [order for order, _ in pairs])
+        
+    return FastJSONResponse({
+        "total": total,
+        "items": items,
+        "page": None if cursor else skip // limit + 1,
+        "size": limit,
+        "next_cursor": next_cursor
+    })
+
 @router.get("/{order_id}", response_model=schemas.Order)
 def read_order(order_id: str, db: Session = Depends(database.get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    order = db.query(models.Order).options(*loaders.order_options()).filter(models.Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -65,7 +182,8 @@ def update_order_status(
     order_id: str, 
     status_update: dict, 
     db: Session = Depends(database.get_db),
-    db_admin: Session = Depends(database.get_admin_db)
+    db_admin: Session = Depends(database.get_admin_db),
+    batch: cross_db.CrossLoaders = Depends(cross_db.get_loaders)
 ):
     order = db.query(models.Order).filter(models.Order.id == order_id).first()
     if not order:
@@ -75,14 +193,13 @@ def update_order_status(
     if not new_status:
         raise HTTPException(status_code=400, detail="Status is required")
         
-    order.status = new_status
+    order_stats.change_status(db, order, new_status)
     db.commit()
     db.refresh(order)
     
     # If status is 'shipped', create a shipping record if it doesn't exist
     if new_status == 'shipped':
-        shipping = db_admin.query(models.Shipping).filter(models.Shipping.order_id == order_id).first()
-        if not shipping:
+        if not batch.shippings.load(order_id):
             # Create default shipping record
             new_shipping = models.Shipping(
                 order_id=order_id,
@@ -104,6 +221,7 @@ def delete_order(order_id: str, db: Session = Depends(database.get_db)):
     # Delete order items first
     db.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).delete()
     
+    order_stats.remove_order(db, order)
     db.delete(order)
     db.commit()
     return {"message": "Order deleted successfully"}
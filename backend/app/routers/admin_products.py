@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import models, schemas, database
-import shutil
+from .. import models, schemas, database, search, pagination, loaders, cache, product_import, export, cart_store, upload_store, image_variants, category_stats
+from sqlalchemy import select
 import os
-from sqlalchemy import or_
 
 router = APIRouter(
     prefix="/admin/products",
@@ -21,6 +21,7 @@ def read_products(
     status: Optional[str] = None,
     low_stock: Optional[bool] = False,
     sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db)
 ):
     query = db.query(models.Product)
@@ -34,32 +35,67 @@ def read_products(
     if low_stock:
         query = query.filter(models.Product.stock < 50)
         
+    score = None
     if q:
-        search = f"%{q}%"
-        query = query.filter(
-            or_(
-                models.Product.name.like(search),
-                models.Product.description.like(search)
-            )
-        )
+        query, score = search.apply_search(db, query, q)
         
     if sort_by == 'sales_desc':
-        query = query.order_by(models.Product.sales.desc())
+        order = [(models.Product.sales, True), (models.Product.id, True)]
+    elif score is not None:
+        # Rank by relevance unless an explicit sort was requested
+        order = [(score, True), (models.Product.sales, True), (models.Product.id, False)]
+    else:
+        order = [(models.Product.id, False)]
         
-    total = query.count()
-    # Use joinedload to eagerly load relationships for Pydantic validation
-    products = query.options(
-        joinedload(models.Product.images),
-        joinedload(models.Product.specs)
-    ).offset(skip).limit(limit).all()
+    # Cursor mode skips the COUNT over the filtered set
+    total = None if cursor else query.count()
+    # Eagerly load images and specs (one IN query each) for Pydantic validation
+    products, next_cursor = pagination.paginate(
+        query.options(*loaders.product_options()),
+        order, skip, limit, cursor
+    )
     
     return {
         "total": total,
         "items": products,
-        "page": skip // limit + 1,
-        "size": limit
+        "page": None if cursor else skip // limit + 1,
+        "size": limit,
+        "next_cursor": next_cursor
     }
 
+@router.get("/export")
+def export_products(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+):
+    # Streams one row per product; see app/export.py
+    statement = select(
+        models.Product.id,
+        models.Product.name,
+        models.Product.category,
+        models.Product.price,
+        models.Product.stock,
+        models.Product.sales,
+        models.Product.rating,
+        models.Product.status,
+        models.Product.image,
+        models.Product.description,
+    )
+    
+    if category and category != "全部" and category != "全部分类":
+        statement = statement.where(models.Product.category == category)
+        
+    if status:
+        statement = statement.where(models.Product.status == status)
+        
+    return export.export_response(statement.order_by(models.Product.id), "products", fmt)
+
+@router.get("/cache-stats")
+def read_cache_stats():
+    # Hit/miss counters of the storefront catalog cache (this worker only)
+    return cache.catalog_cache.stats()
+
 @router.post("/", response_model=schemas.Product)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(database.get_db)):
     product_data = product.dict()
@@ -68,6 +104,7 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(databas
     
     db_product = models.Product(**product_data)
     db.add(db_product)
+    category_stats.record_product(db, db_product.category)
     db.commit()
     db.refresh(db_product)
     
@@ -81,7 +118,9 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(databas
             db_spec = models.ProductSpec(product_id=db_product.id, spec=spec_text)
             db.add(db_spec)
             
+    search.index_product(db, db_product)
     db.commit()
+    cache.catalog_cache.invalidate()
     db.refresh(db_product)
     return db_product
 
@@ -114,10 +153,17 @@ def update_product(product_id: str, product: schemas.ProductUpdate, db: Session
                 db_spec = models.ProductSpec(product_id=product_id, spec=spec_text)
                 db.add(db_spec)
     
+    if 'category' in update_data:
+        category_stats.move_product(db, db_product.category, update_data['category'])
+
     for key, value in update_data.items():
         setattr(db_product, key, value)
         
+    if 'name' in update_data or 'description' in update_data:
+        search.index_product(db, db_product)
+        
     db.commit()
+    cache.catalog_cache.invalidate()
     db.refresh(db_product)
     return db_product
 
@@ -127,8 +173,13 @@ def delete_product(product_id: str, db: Session = Depends(database.get_db)):
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    search.remove_products(db, [product_id])
+    category_stats.remove_product(db, db_product.category)
     db.delete(db_product)
     db.commit()
+    cache.catalog_cache.invalidate()
+    cart_store.store.drop_products([product_id])
+    cache.favorite_cache.invalidate()
     return {"message": "Product deleted successfully"}
 
 @router.post("/batch-delete")
@@ -138,101 +189,67 @@ def batch_delete_products(product_ids: List[str], db: Session = Depends(database
     db.query(models.ProductSpec).filter(models.ProductSpec.product_id.in_(product_ids)).delete(synchronize_session=False)
     db.query(models.CartItem).filter(models.CartItem.product_id.in_(product_ids)).delete(synchronize_session=False)
     db.query(models.Favorite).filter(models.Favorite.product_id.in_(product_ids)).delete(synchronize_session=False)
+    search.remove_products(db, product_ids)
+    category_stats.remove_products(db, product_ids)
     
     # Also delete OrderItems to allow deletion (WARNING: This modifies historical orders)
     db.query(models.OrderItem).filter(models.OrderItem.product_id.in_(product_ids)).delete(synchronize_session=False)
     
     db.query(models.Product).filter(models.Product.id.in_(product_ids)).delete(synchronize_session=False)
     db.commit()
+    cache.catalog_cache.invalidate()
+    cart_store.store.drop_products(product_ids)
+    cache.favorite_cache.invalidate()
     return {"message": f"Successfully deleted {len(product_ids)} products"}
 
 @router.post("/upload")
 async def upload_product_image(file: UploadFile = File(...)):
-    upload_dir = "uploads/products"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-        
-    file_extension = os.path.splitext(file.filename)[1]
-    # Generate unique filename
-    import uuid
-    file_name = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(upload_dir, file_name)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Return URL (assuming localhost:8001 for admin backend, but images might be served from there too)
-    # Note: If marketplace frontend needs to see these images, they should be accessible.
-    # Currently admin backend serves static files from "uploads".
-    return {"url": f"http://localhost:8001/uploads/products/{file_name}"}
+    # Stored by content hash, so the same image uploaded twice is kept once
+    # and the URL can be cached forever
+    key = await upload_store.save_image(file)
+    # Thumbnail/medium/WebP renditions are generated in the background
+    image_variants.schedule(key)
+    return {"url": upload_store.url_for(key)}
 
 @router.post("/batch-upload")
-async def batch_upload_products(file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+async def batch_upload_products(file: UploadFile = File(...)):
+    # Synchronous import: waits for the whole file and returns the result
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
-    content = await file.read()
-    decoded_content = content.decode('utf-8-sig') # Handle BOM
-    lines = decoded_content.splitlines()
+    path = await product_import.save_upload(file)
+    try:
+        result = await run_in_threadpool(product_import.run_import, path)
+    finally:
+        os.remove(path)
     
-    # Skip header
-    if len(lines) > 0:
-        lines = lines[1:]
-        
-    created_count = 0
-    errors = []
+    return {
+        "message": f"Successfully uploaded {result.created_count} products",
+        "errors": result.errors
+    }
+
+@router.post("/batch-upload/jobs", response_model=schemas.ProductImportJob)
+async def create_batch_upload_job(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    db: Session = Depends(database.get_admin_db)
+):
+    # Background import: returns a job immediately, poll it for progress
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
-    for i, line in enumerate(lines):
-        if not line.strip():
-            continue
-            
-        try:
-            # Expected format: name,category,price,stock,description,image_url,additional_images,specs
-            parts = line.split(',')
-            if len(parts) < 4:
-                errors.append(f"Line {i+2}: Insufficient fields")
-                continue
-                
-            name = parts[0].strip()
-            category = parts[1].strip()
-            price = float(parts[2].strip())
-            stock = int(parts[3].strip())
-            description = parts[4].strip() if len(parts) > 4 else ""
-            image = parts[5].strip() if len(parts) > 5 else ""
-            additional_images_str = parts[6].strip() if len(parts) > 6 else ""
-            specs_str = parts[7].strip() if len(parts) > 7 else ""
-            
-            product = models.Product(
-                name=name,
-                category=category,
-                price=price,
-                stock=stock,
-                description=description,
-                image=image,
-                sales=0,
-                rating=0
-            )
-            db.add(product)
-            db.flush() # Generate ID
-            
-            if additional_images_str:
-                for img_url in additional_images_str.split('|'):
-                    if img_url.strip():
-                        db.add(models.ProductImage(product_id=product.id, url=img_url.strip()))
-                        
-            if specs_str:
-                for spec in specs_str.split('|'):
-                    if spec.strip():
-                        db.add(models.ProductSpec(product_id=product.id, spec=spec.strip()))
-            
-            created_count += 1
-            
-        except Exception as e:
-            errors.append(f"Line {i+2}: {str(e)}")
-            
+    path = await product_import.save_upload(file)
+    job = models.ProductImportJob(filename=file.filename, status="pending")
+    db.add(job)
     db.commit()
+    db.refresh(job)
     
-    return {
-        "message": f"Successfully uploaded {created_count} products",
-        "errors": errors
-    }
+    background_tasks.add_task(product_import.run_job, job.id, path)
+    return job
+
+@router.get("/batch-upload/jobs/{job_id}", response_model=schemas.ProductImportJob)
+def read_batch_upload_job(job_id: str, db: Session = Depends(database.get_admin_db)):
+    job = db.query(models.ProductImportJob).filter(models.ProductImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
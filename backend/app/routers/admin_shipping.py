@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import models, schemas, database
+from .. import models, schemas, database, pagination, cross_db
+from ..json_response import FastJSONResponse, validate_many
 from datetime import datetime
 
 router = APIRouter(
@@ -14,31 +15,107 @@ router = APIRouter(
 def read_shippings(
     skip: int = 0, 
     limit: int = 10, 
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_admin_db),
-    db_main: Session = Depends(database.get_db)
+    batch: cross_db.CrossLoaders = Depends(cross_db.get_loaders)
 ):
     query = db.query(models.Shipping)
-    total = query.count()
-    shippings = query.offset(skip).limit(limit).all()
+    # Cursor mode skips the COUNT
+    total = None if cursor else query.count()
+    shippings, next_cursor = pagination.paginate(query, [(models.Shipping.id, False)], skip, limit, cursor)
     
-    # Fetch associated orders
-    order_ids = [s.order_id for s in shippings]
-    orders = db_main.query(models.Order).filter(models.Order.id.in_(order_ids)).all()
-    orders_map = {o.id: o for o in orders}
+    # Fetch associated orders (one IN query)
+    orders = batch.orders.load_many([s.order_id for s in shippings])
     
-    items = []
-    for s in shippings:
-        s.order = orders_map.get(s.order_id)
-        # Explicitly convert to Pydantic model to ensure serialization
-        # Using model_validate for Pydantic v2
-        items.append(schemas.ShippingWithOrder.model_validate(s))
+    for s, order in zip(shippings, orders):
+        s.order = order
+    items = validate_many(schemas.ShippingWithOrder, shippings)
         
-    return {
+    return FastJSONResponse({
         "total": total,
         "items": items,
-        "page": skip // limit + 1,
-        "size": limit
-    }
+        "page": None if cursor else skip // limit + 1,
+        "size": limit,
+        "next_cursor": next_cursor
+    })
+
+# Every ordering ends with id so cursor positions are unique
+SHIPPING_SORTS = {
+    None: [(models.Shipping.id, False)],
+    "shipping_time_desc": [(models.Shipping.shipping_time, True), (models.Shipping.id, True)],
+    "shipping_time_asc": [(models.Shipping.shipping_time, False), (models.Shipping.id, False)],
+}
+# Sorts on order fields page over the orders table instead of shippings
+ORDER_SORTS = {
+    "order_time_desc": [(models.Order.create_time, True), (models.Order.id, True)],
+    "amount_desc": [(pagination.exact(models.Order.total_amount), True), (models.Order.id, True)],
+    "amount_asc": [(pagination.exact(models.Order.total_amount), False), (models.Order.id, False)],
+}
+
+@router.get("/with-orders", response_model=dict)
+def read_shippings_with_orders(
+    skip: int = 0,
+    limit: int = 10,
+    status: Optional[str] = None,
+    carrier: Optional[str] = None,
+    order_status: Optional[str] = None,
+    order_number: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(database.get_admin_db),
+    db_main: Session = Depends(database.get_db),
+    batch: cross_db.CrossLoaders = Depends(cross_db.get_loaders)
+):
+    # Shippings with their order, filterable and sortable by order fields.
+    # A filter on the other database is checked one scanned batch at a time
+    # (see app/cross_db.py); the page's other half is fetched with one IN
+    # query.
+    shipping_conditions = []
+    if status:
+        shipping_conditions.append(models.Shipping.status == status)
+    if carrier:
+        shipping_conditions.append(models.Shipping.carrier == carrier)
+        
+    order_conditions = []
+    if order_status and order_status != "all":
+        order_conditions.append(models.Order.status == order_status)
+    if order_number:
+        order_conditions.append(models.Order.order_number.like(f"%{order_number}%"))
+        
+    if sort_by in ORDER_SORTS:
+        # Scan order ids for orders that have a matching shipping
+        query = db_main.query(models.Order.id).filter(*order_conditions)
+        keep = lambda ids: cross_db.matching_ids(db, models.Shipping.order_id, ids, shipping_conditions)
+        total = None
+        order_ids, next_cursor = cross_db.scan_page(query, ORDER_SORTS[sort_by], skip, limit, cursor, keep)
+        orders = batch.orders.load_many(order_ids)
+        shippings = batch.shippings.load_many(order_ids)
+        pairs = [(s, order) for s, order in zip(shippings, orders) if s is not None and order is not None]
+    else:
+        query = db.query(models.Shipping).filter(*shipping_conditions)
+        order = SHIPPING_SORTS.get(sort_by, SHIPPING_SORTS[None])
+        if order_conditions:
+            def keep(shippings):
+                ids = cross_db.matching_ids(db_main, models.Order.id, [s.order_id for s in shippings], order_conditions)
+                return {s for s in shippings if s.order_id in ids}
+            total = None
+            shippings, next_cursor = cross_db.scan_page(query, order, skip, limit, cursor, keep)
+        else:
+            total = None if cursor else query.count()
+            shippings, next_cursor = pagination.paginate(query, order, skip, limit, cursor)
+        pairs = list(zip(shippings, batch.orders.load_many([s.order_id for s in shippings])))
+        
+    for s, order in pairs:
+        s.order = order
+    items = validate_many(schemas.ShippingWithOrder, [s for s, _ in pairs])
+        
+    return FastJSONResponse({
+        "total": total,
+        "items": items,
+        "page": None if cursor else skip // limit + 1,
+        "size": limit,
+        "next_cursor": next_cursor
+    })
 
 @router.post("/", response_model=schemas.Shipping)
 def create_shipping(shipping: schemas.ShippingCreate, db: Session = Depends(database.get_admin_db)):
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
-from .. import models, schemas, database
+from .. import models, schemas, database, pagination, rollup, user_stats, cart_store
+from ..json_response import FastJSONResponse
 
 router = APIRouter(
     prefix="/admin/users",
@@ -9,15 +11,56 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _stats_columns(db: Session):
+    # (orders_count, total_spent) for the user list, either from the
+    # user_stats table or from a grouped subquery over orders
+    if user_stats.ENABLED:
+        stats = models.UserStats
+        return stats.user_id, stats.orders_count, stats.total_spent
+        
+    stats = db.query(
+        models.Order.user_id.label("user_id"),
+        func.count(models.Order.id).label("orders_count"),
+        func.sum(models.Order.total_amount).label("total_spent")
+    ).group_by(models.Order.user_id).subquery()
+    return stats.c.user_id, stats.c.orders_count, stats.c.total_spent
+
+def _default_address_ids(db: Session):
+    # Default address per user, falling back to the first one
+    return db.query(
+        models.Address.user_id.label("user_id"),
+        func.coalesce(
+            func.min(case((models.Address.is_default == True, models.Address.id))),
+            func.min(models.Address.id)
+        ).label("address_id")
+    ).group_by(models.Address.user_id).subquery()
+
 @router.get("/", response_model=dict)
 def read_users(
     skip: int = 0,
     limit: int = 10,
     search: Optional[str] = None,
     status: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    min_spent: Optional[float] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(database.get_db) # Use main DB
 ):
-    query = db.query(models.User)
+    # Users, order stats and default address in one statement
+    stats_user_id, stats_count, stats_spent = _stats_columns(db)
+    orders_count = func.coalesce(stats_count, 0)
+    total_spent = func.coalesce(stats_spent, 0.0)
+    address_ids = _default_address_ids(db)
+    
+    query = db.query(models.User, orders_count, total_spent, models.Address).options(
+        joinedload(models.User.vip_level)
+    ).outerjoin(
+        stats_user_id.table, stats_user_id == models.User.id
+    ).outerjoin(
+        address_ids, address_ids.c.user_id == models.User.id
+    ).outerjoin(
+        models.Address, models.Address.id == address_ids.c.address_id
+    )
     
     if search:
         search_term = f"%{search}%"
@@ -31,37 +74,39 @@ def read_users(
         is_active = True if status == '活跃' else False
         query = query.filter(models.User.is_active == is_active)
         
-    total = query.count()
-    users = query.offset(skip).limit(limit).all()
+    if min_spent is not None:
+        query = query.filter(total_spent >= min_spent)
+        
+    if sort_by == 'spent_desc':
+        order = [(pagination.exact(total_spent), True), (models.User.id, True)]
+    elif sort_by == 'orders_desc':
+        order = [(orders_count, True), (models.User.id, True)]
+    else:
+        order = [(models.User.id, False)]
+        
+    # Cursor mode skips the COUNT over the filtered set
+    total = None if cursor else query.count()
+    rows, next_cursor = pagination.paginate(query, order, skip, limit, cursor)
     
     items = []
-    for user in users:
-        # Calculate stats
-        orders_count = len(user.orders)
-        total_spent = sum(order.total_amount for order in user.orders)
-        
-        # Get address
+    for user, user_orders_count, user_total_spent, address in rows:
         address_str = "未知地址"
-        if user.addresses:
-            # Try to find default address
-            default_addr = next((a for a in user.addresses if a.is_default), user.addresses[0])
-            address_str = f"{default_addr.province or ''}{default_addr.city or ''}{default_addr.district or ''}{default_addr.detail or ''}"
+        if address:
+            address_str = f"{address.province or ''}{address.city or ''}{address.district or ''}{address.detail or ''}"
             
-        # Create UserAdminView
-        # We need to handle potential missing fields or None values if schema is strict
-        # Using model_validate to convert SQLAlchemy model to Pydantic model
         user_view = schemas.UserAdminView.model_validate(user)
-        user_view.orders_count = orders_count
-        user_view.total_spent = total_spent
+        user_view.orders_count = user_orders_count
+        user_view.total_spent = user_total_spent
         user_view.address_str = address_str
         items.append(user_view)
         
-    return {
+    return FastJSONResponse({
         "total": total,
         "items": items,
-        "page": skip // limit + 1,
-        "size": limit
-    }
+        "page": None if cursor else skip // limit + 1,
+        "size": limit,
+        "next_cursor": next_cursor
+    })
 
 @router.put("/{user_id}/status")
 def update_user_status(
@@ -83,8 +128,11 @@ def delete_user(user_id: str, db: Session = Depends(database.get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
+    rollup.remove_user(db, user.register_time)
+    db.query(models.UserStats).filter(models.UserStats.user_id == user_id).delete()
     db.delete(user)
     db.commit()
+    cart_store.store.discard(user_id)
     return {"message": "User deleted successfully"}
 
 @router.post("/", response_model=schemas.User)
@@ -106,6 +154,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
         is_active=True
     )
     db.add(db_user)
+    rollup.record_user(db)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
-from .. import models, schemas, database
+from datetime import datetime
+from .. import models, schemas, database, cache
 import json
 
 router = APIRouter(
@@ -11,36 +13,35 @@ router = APIRouter(
     responses={404: {"detail": "Not found"}},
 )
 
+vip_list_adapter = TypeAdapter(List[schemas.VIPLevel])
+
 @router.get("/", response_model=List[schemas.VIPLevel])
-def read_vip_levels(db: Session = Depends(database.get_db)):
-    vip_levels = db.query(models.VIPLevel).order_by(models.VIPLevel.level).all()
-    
-    result = []
-    for vip in vip_levels:
-        # Calculate member count
-        member_count = db.query(models.User).filter(models.User.vip_level_id == vip.id).count()
+def read_vip_levels(request: Request, db: Session = Depends(database.get_db)):
+    def build():
+        # 1. Levels with member counts
+        levels = db.query(models.VIPLevel, func.count(models.User.id)).outerjoin(
+            models.User, models.User.vip_level_id == models.VIPLevel.id
+        ).group_by(models.VIPLevel.id).order_by(models.VIPLevel.level).all()
         
-        # Calculate monthly revenue
-        # Get first day of current month
-        today = datetime.utcnow()
-        first_day = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Find orders from users in this VIP level created this month
-        # This might be slow if many users/orders, but for now it's fine
-        # Optimized query: Join Order and User
-        revenue = db.query(models.Order).join(models.User).filter(
-            models.User.vip_level_id == vip.id,
+        # 2. This month's revenue per level, summed in SQL
+        first_day = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        revenue = dict(db.query(models.User.vip_level_id, func.sum(models.Order.total_amount)).join(
+            models.Order, models.Order.user_id == models.User.id
+        ).filter(
+            models.User.vip_level_id.isnot(None),
             models.Order.create_time >= first_day
-        ).with_entities(models.Order.total_amount).all()
-        
-        monthly_revenue = sum(r[0] for r in revenue if r[0])
+        ).group_by(models.User.vip_level_id).all())
         
-        vip_data = schemas.VIPLevel.model_validate(vip)
-        vip_data.memberCount = member_count
-        vip_data.monthlyRevenue = monthly_revenue
-        result.append(vip_data)
+        result = []
+        for vip, member_count in levels:
+            vip_data = schemas.VIPLevel.model_validate(vip)
+            vip_data.memberCount = member_count
+            vip_data.monthlyRevenue = revenue.get(vip.id) or 0.0
+            result.append(vip_data)
+            
+        return vip_list_adapter.dump_json(result), {}
         
-    return result
+    return cache.cached_json_response(request, cache.vip_cache, "levels", build)
 
 @router.post("/", response_model=schemas.VIPLevel)
 def create_vip_level(vip: schemas.VIPLevelCreate, db: Session = Depends(database.get_db)):
@@ -67,6 +68,7 @@ def create_vip_level(vip: schemas.VIPLevelCreate, db: Session = Depends(database
     
     db.add(new_vip)
     db.commit()
+    cache.vip_cache.invalidate()
     db.refresh(new_vip)
     return new_vip
 
@@ -85,6 +87,7 @@ def update_vip_level(vip_id: str, vip_update: schemas.VIPLevelUpdate, db: Sessio
         setattr(db_vip, key, value)
         
     db.commit()
+    cache.vip_cache.invalidate()
     db.refresh(db_vip)
     return db_vip
 
@@ -101,4 +104,5 @@ def delete_vip_level(vip_id: str, db: Session = Depends(database.get_db)):
         
     db.delete(db_vip)
     db.commit()
+    cache.vip_cache.invalidate()
     return {"message": "VIP level deleted successfully"}
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, database
+from fastapi import APIRouter
+from typing import List, Optional
+from .. import schemas, cart_store, fieldsets
+from ..json_response import FastJSONResponse, validate_many
+
+# Carts are read and written through cart_store, which keeps them in memory
+# and writes quantity changes to cart_items in the background.
 
 router = APIRouter(
     prefix="/cart",
@@ -10,72 +13,41 @@ router = APIRouter(
 )
 
 @router.get("/{user_id}", response_model=List[schemas.CartItem])
-def get_cart(user_id: str, db: Session = Depends(database.get_db)):
-    return db.query(models.CartItem).filter(models.CartItem.user_id == user_id).all()
+def get_cart(user_id: str, fields: Optional[str] = None):
+    # fields= narrows each item's product (see app/fieldsets.py). The cart is
+    # served from memory, so this only trims the response.
+    selection = fieldsets.parse(fields)
+    items = cart_store.store.items(user_id)
+    if selection:
+        return FastJSONResponse(validate_many(fieldsets.with_product(schemas.CartItem, selection), items))
+    return items
 
 @router.post("/{user_id}", response_model=schemas.CartItem)
-def add_to_cart(user_id: str, item: schemas.CartItemCreate, db: Session = Depends(database.get_db)):
-    # Check if product exists
-    product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    # Check if item already exists in cart
-    db_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == user_id,
-        models.CartItem.product_id == item.product_id
-    ).first()
-
-    if db_item:
-        db_item.quantity += item.quantity
-    else:
-        db_item = models.CartItem(
-            user_id=user_id,
-            product_id=item.product_id,
-            quantity=item.quantity
-        )
-        db.add(db_item)
-    
-    db.commit()
-    db.refresh(db_item)
-    return db_item
+def add_to_cart(user_id: str, item: schemas.CartItemCreate):
+    operation = schemas.CartOperation(op="add", product_id=item.product_id, quantity=item.quantity)
+    before, after = cart_store.store.apply(user_id, [operation])
+    return after.get(item.product_id) or before[item.product_id]
+
+@router.patch("/{user_id}/batch", response_model=List[schemas.CartItem])
+def batch_update_cart(user_id: str, batch: schemas.CartBatch):
+    # Applies all operations in order in one transaction; if any of them
+    # fails (unknown product, item not in cart) none are applied
+    before, after = cart_store.store.apply(user_id, batch.operations, write_through=True)
+    return list(after.values())
 
 @router.put("/{user_id}/{product_id}", response_model=schemas.CartItem)
-def update_cart_item(user_id: str, product_id: str, item: schemas.CartItemUpdate, db: Session = Depends(database.get_db)):
-    db_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == user_id,
-        models.CartItem.product_id == product_id
-    ).first()
-
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Item not found in cart")
-
-    if item.quantity <= 0:
-        db.delete(db_item)
-        db.commit()
-        return db_item # This might be tricky as it's deleted, but for now let's return it or handle in frontend
-    
-    db_item.quantity = item.quantity
-    db.commit()
-    db.refresh(db_item)
-    return db_item
+def update_cart_item(user_id: str, product_id: str, item: schemas.CartItemUpdate):
+    operation = schemas.CartOperation(op="update", product_id=product_id, quantity=item.quantity)
+    before, after = cart_store.store.apply(user_id, [operation])
+    # A quantity <= 0 removes the item; the removed item is returned
+    return after.get(product_id) or before[product_id]
 
 @router.delete("/{user_id}/{product_id}")
-def remove_from_cart(user_id: str, product_id: str, db: Session = Depends(database.get_db)):
-    db_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == user_id,
-        models.CartItem.product_id == product_id
-    ).first()
-
-    if not db_item:
-        raise HTTPException(status_code=404, detail="Item not found in cart")
-
-    db.delete(db_item)
-    db.commit()
+def remove_from_cart(user_id: str, product_id: str):
+    cart_store.store.apply(user_id, [schemas.CartOperation(op="remove", product_id=product_id)])
     return {"message": "Item removed"}
 
 @router.delete("/{user_id}")
-def clear_cart(user_id: str, db: Session = Depends(database.get_db)):
-    db.query(models.CartItem).filter(models.CartItem.user_id == user_id).delete()
-    db.commit()
+def clear_cart(user_id: str):
+    cart_store.store.clear(user_id)
     return {"message": "Cart cleared"}
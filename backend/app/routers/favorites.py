@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, database
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import models, schemas, database, loaders, cache, fieldsets
+from ..json_response import FastJSONResponse, validate_many
 
 router = APIRouter(
     prefix="/favorites",
@@ -10,8 +13,26 @@ router = APIRouter(
 )
 
 @router.get("/{user_id}", response_model=List[schemas.Favorite])
-def get_favorites(user_id: str, db: Session = Depends(database.get_db)):
-    return db.query(models.Favorite).filter(models.Favorite.user_id == user_id).all()
+async def get_favorites(user_id: str, fields: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db)):
+    # fields= narrows each favorite's product (see app/fieldsets.py)
+    selection = fieldsets.parse(fields)
+    result = await db.execute(
+        select(models.Favorite).options(*loaders.favorite_options(selection)).where(models.Favorite.user_id == user_id)
+    )
+    schema = fieldsets.with_product(schemas.Favorite, selection) if selection else schemas.Favorite
+    return FastJSONResponse(validate_many(schema, result.scalars().all()))
+
+@router.post("/{user_id}/contains")
+async def contains_favorites(user_id: str, query: schemas.FavoriteContains, db: AsyncSession = Depends(database.get_async_db)):
+    # Heart state for a page of product cards: one bool per requested id, in
+    # order, answered from the user's cached set of favorited product ids
+    favorited = cache.favorite_cache.get(user_id)
+    if favorited is None:
+        token = cache.favorite_cache.token()
+        result = await db.execute(select(models.Favorite.product_id).where(models.Favorite.user_id == user_id))
+        favorited = frozenset(result.scalars().all())
+        cache.favorite_cache.set(user_id, favorited, token)
+    return {"favorited": [product_id in favorited for product_id in query.product_ids]}
 
 @router.post("/{user_id}", response_model=schemas.Favorite)
 def add_favorite(user_id: str, favorite: schemas.FavoriteCreate, db: Session = Depends(database.get_db)):
@@ -35,6 +56,7 @@ def add_favorite(user_id: str, favorite: schemas.FavoriteCreate, db: Session = D
     )
     db.add(db_favorite)
     db.commit()
+    cache.favorite_cache.update(user_id, lambda favorited: favorited | {favorite.product_id})
     db.refresh(db_favorite)
     return db_favorite
 
@@ -50,4 +72,5 @@ def remove_favorite(user_id: str, product_id: str, db: Session = Depends(databas
 
     db.delete(db_favorite)
     db.commit()
+    cache.favorite_cache.update(user_id, lambda favorited: favorited - {product_id})
     return {"message": "Favorite removed"}
@@ -0,0 +1,35 @@
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from .. import upload_store, image_variants
+
+router = APIRouter(
+    prefix="/media",
+    tags=["media"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Files in the upload store never change (the name is the content hash), so
+# browsers and CDNs may cache them for a year without revalidating
+IMMUTABLE = "public, max-age=31536000, immutable"
+# An image variant that has not been generated yet is answered with the
+# original, cached briefly so the variant is picked up once it exists
+PENDING_VARIANT = "public, max-age=60"
+
+@router.get("/{key}")
+async def read_media(key: str, request: Request):
+    if not upload_store.KEY_RE.match(key):
+        raise HTTPException(status_code=404, detail="File not found")
+    path = upload_store.path_for(key)
+    if not os.path.isfile(path):
+        original = image_variants.original_key(key)
+        if not original or not os.path.isfile(upload_store.path_for(original)):
+            raise HTTPException(status_code=404, detail="File not found")
+        return FileResponse(upload_store.path_for(original), headers={"Cache-Control": PENDING_VARIANT})
+
+    etag = '"%s"' % key.split(".")[0]
+    headers = {"Cache-Control": IMMUTABLE, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
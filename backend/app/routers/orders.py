@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, database
-import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import models, schemas, database, loaders, order_stats, order_numbers, cart_store, fieldsets
+from ..json_response import FastJSONResponse, validate_many
+import json
 
 router = APIRouter(
     prefix="/orders",
@@ -12,22 +15,45 @@ router = APIRouter(
 
 @router.post("/{user_id}", response_model=schemas.Order)
 def create_order(user_id: str, order_create: schemas.OrderCreate, db: Session = Depends(database.get_db)):
-    # 1. Get cart items
-    cart_items = db.query(models.CartItem).filter(models.CartItem.user_id == user_id).all()
+    # Pending cart changes are flushed first, and the user's cart stays locked
+    # in the cart store until the order is committed
+    with cart_store.store.checkout(user_id):
+        return _checkout(user_id, order_create, db)
+
+def _checkout(user_id: str, order_create: schemas.OrderCreate, db: Session):
+    # Checkout runs as a single transaction. The cart rows are locked so a
+    # double submit cannot turn one cart into two orders; product rows are
+    # only locked by the conditional stock UPDATEs, which run last so hot
+    # products stay locked for as short a time as possible. The order counters
+    # are written after them, just before the commit.
+
+    # 1. Get cart items with their products
+    cart_items = (
+        db.query(models.CartItem, models.Product)
+        .join(models.Product, models.CartItem.product_id == models.Product.id)
+        .filter(models.CartItem.user_id == user_id)
+        .with_for_update(of=models.CartItem)
+        .all()
+    )
     if not cart_items:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
     # 2. Calculate total amount
     total_amount = 0
-    for item in cart_items:
-        total_amount += item.product.price * item.quantity
+    quantities = {}
+    products = {}
+    for item, product in cart_items:
+        total_amount += product.price * item.quantity
+        quantities[product.id] = quantities.get(product.id, 0) + item.quantity
+        products[product.id] = product
 
     # 3. Create Order
-    # Generate order number: PET + timestamp
-    order_number = f"PET{int(datetime.datetime.utcnow().timestamp() * 1000)}"
-    
-    import json
-    db_order = models.Order(
+    # Generate order number: PET + time/worker/sequence id
+    order_number = order_numbers.next_order_number()
+
+    order_id = models.generate_uuid()
+    order = models.Order(
+        id=order_id,
         order_number=order_number,
         user_id=user_id,
         payment_method=order_create.payment_method,
@@ -35,30 +61,45 @@ def create_order(user_id: str, order_create: schemas.OrderCreate, db: Session =
         status="pending",
         address_snapshot=json.dumps(order_create.address)
     )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.add(order)
+    db.flush()
 
     # 4. Create OrderItems
-    for item in cart_items:
-        order_item = models.OrderItem(
-            order_id=db_order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price=item.product.price
-        )
-        db.add(order_item)
-        
-        # Update product sales and stock (optional but good practice)
-        item.product.sales += item.quantity
-        # item.product.stock -= item.quantity # If we tracked stock strictly
-    
+    db.bulk_insert_mappings(models.OrderItem, [
+        {
+            "order_id": order_id,
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "price": product.price,
+        }
+        for item, product in cart_items
+    ])
+
     # 5. Clear Cart
-    db.query(models.CartItem).filter(models.CartItem.user_id == user_id).delete()
-    
+    db.query(models.CartItem).filter(models.CartItem.user_id == user_id).delete(synchronize_session=False)
+
+    # 6. Reserve stock and count sales. Each UPDATE only matches while enough
+    # stock is left, so concurrent checkouts can never oversell. Products are
+    # updated in id order so two carts sharing products cannot deadlock.
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = db.execute(
+            update(models.Product)
+            .where(models.Product.id == product_id, models.Product.stock >= quantity)
+            .values(stock=models.Product.stock - quantity, sales=models.Product.sales + quantity)
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient stock for {products[product_id].name}"
+            )
+
+    # 7. Order counters
+    order_stats.record_order(db, order)
+
     db.commit()
-    db.refresh(db_order)
-    return db_order
+    return db.query(models.Order).options(*loaders.order_options()).filter(models.Order.id == order_id).first()
 
 @router.post("/{order_id}/pay")
 def pay_order(order_id: str, payment_method: str = "wechat", db: Session = Depends(database.get_db)):
@@ -69,20 +110,27 @@ def pay_order(order_id: str, payment_method: str = "wechat", db: Session = Depen
     if order.status != "pending":
         raise HTTPException(status_code=400, detail="Order is not pending payment")
 
-    order.status = "paid"
     order.payment_method = payment_method
+    order_stats.change_status(db, order, "paid")
     db.commit()
     db.refresh(order)
     return order
 
 @router.get("/{user_id}", response_model=List[schemas.Order])
-def get_user_orders(user_id: str, db: Session = Depends(database.get_db)):
-    orders = db.query(models.Order).filter(models.Order.user_id == user_id).order_by(models.Order.create_time.desc()).all()
-    return orders
+async def get_user_orders(user_id: str, fields: Optional[str] = None, db: AsyncSession = Depends(database.get_async_db)):
+    # fields= narrows the products of the order items (see app/fieldsets.py)
+    selection = fieldsets.parse(fields)
+    result = await db.execute(
+        select(models.Order).options(*loaders.order_options(selection)).where(models.Order.user_id == user_id).order_by(models.Order.create_time.desc())
+    )
+    schema = fieldsets.order_schema(selection) if selection else schemas.Order
+    return FastJSONResponse(validate_many(schema, result.scalars().all()))
 
 @router.get("/detail/{order_id}", response_model=schemas.Order)
-def get_order_detail(order_id: str, db: Session = Depends(database.get_db)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+async def get_order_detail(order_id: str, db: AsyncSession = Depends(database.get_async_db)):
+    order = await db.scalar(
+        select(models.Order).options(*loaders.order_options()).where(models.Order.id == order_id)
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from .. import models, schemas, database
+from .. import models, schemas, database, search, pagination, loaders, cache, search_events, category_stats, fieldsets
+from ..json_response import dump_many
 
 router = APIRouter(
     prefix="/products",
@@ -10,53 +12,88 @@ router = APIRouter(
 )
 
 from typing import List, Optional
-from sqlalchemy import or_
+from pydantic import TypeAdapter
+
+product_list_adapter = TypeAdapter(List[schemas.Product])
+
+def _query_products(db: Session, skip: int, limit: int, q: Optional[str], category: Optional[str], cursor: Optional[str], selection=None):
+    query = db.query(models.Product).options(*loaders.product_options(selection))
+    
+    if category and category != "全部":
+        query = query.filter(models.Product.category == category)
+        
+    score = None
+    if q:
+        query, score = search.apply_search(db, query, q)
+        
+    if score is not None:
+        order = [(score, True), (models.Product.sales, True), (models.Product.id, False)]
+    else:
+        order = [(models.Product.id, False)]
+        
+    return pagination.paginate(query, order, skip, limit, cursor)
 
 @router.get("/", response_model=List[schemas.Product])
-def read_products(
+async def read_products(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     q: Optional[str] = None,
     category: Optional[str] = None,
-    db: Session = Depends(database.get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    query = db.query(models.Product)
-    
-    if category and category != "全部":
-        query = query.filter(models.Product.category == category)
-        
-    if q:
-        search = f"%{q}%"
-        query = query.filter(
-            or_(
-                models.Product.name.like(search),
-                models.Product.description.like(search)
+    # fields= narrows the products to the listed fields (see app/fieldsets.py)
+    selection = fieldsets.parse(fields)
+
+    # Serve the serialized page from the catalog cache when possible; it is
+    # invalidated by the admin product endpoints.
+    async def build():
+        # The query helpers use the sync Query API; run_sync drives them over
+        # the async connection without blocking the event loop.
+        products, next_cursor = await db.run_sync(_query_products, skip, limit, q, category, cursor, selection)
+        if selection:
+            body = dump_many(fieldsets.product_schema(selection), products)
+        else:
+            body = product_list_adapter.dump_json(
+                product_list_adapter.validate_python(products, from_attributes=True)
             )
-        )
+        # The body stays a plain list for compatibility; the cursor for the
+        # next page is returned in a header.
+        return body, {"X-Next-Cursor": next_cursor} if next_cursor else {}
         
-    products = query.offset(skip).limit(limit).all()
-    return products
+    return await cache.cached_json_response_async(
+        request, cache.catalog_cache, ("products", category, q, skip, limit, cursor, selection), build
+    )
 
 @router.post("/search-history")
-def create_search_history(
-    keyword: str,
-    user_id: str,
-    db: Session = Depends(database.get_db)
-):
-    print(f"Received search history request: keyword={keyword}, user_id={user_id}")
+async def create_search_history(keyword: str, user_id: str):
     if not keyword or not user_id:
-        print("Missing keyword or user_id")
         return {"message": "Keyword and user_id required"}
-        
-    history = models.SearchHistory(user_id=user_id, keyword=keyword)
-    db.add(history)
-    db.commit()
+
+    # Buffered and written to search_history in batches
+    search_events.record(user_id, keyword)
     return {"message": "History created"}
 
+@router.get("/trending-searches")
+async def trending_searches(limit: int = Query(10, ge=1, le=100)):
+    # Most searched keywords over roughly the last one to two TRENDING_WINDOWs,
+    # from the in-memory heavy-hitters summary (search_history is not read).
+    # error is how much count may be overestimated.
+    return search_events.trending.top(limit)
+
 @router.post("/", response_model=schemas.Product)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(database.get_db)):
-    db_product = models.Product(**product.dict())
+    product_data = product.dict()
+    product_data.pop('images', None)
+    product_data.pop('specs', None)
+    db_product = models.Product(**product_data)
     db.add(db_product)
+    db.flush()
+    search.index_product(db, db_product)
+    category_stats.record_product(db, db_product.category)
     db.commit()
+    cache.catalog_cache.invalidate()
     db.refresh(db_product)
     return db_product
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from .. import models, schemas, database
-from passlib.context import CryptContext
+from sqlalchemy.orm import Session, joinedload
+from starlette.concurrency import run_in_threadpool
+from .. import models, schemas, database, rollup, passwords, upload_store
+from ..passwords import pwd_context, get_password_hash, verify_password  # used by the app/test admin scripts
 from typing import List
-import shutil
-import os
 
 router = APIRouter(
     prefix="/users",
@@ -12,21 +11,22 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# The password endpoints are async: bcrypt runs in the passwords process pool
+# and only the short database steps go through the threadpool.
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def _find_user(db: Session, identifier: str):
+    # Emails always contain "@" and phone numbers never do, so one indexed
+    # lookup finds the user
+    column = models.User.email if "@" in identifier else models.User.phone
+    return db.query(models.User).options(joinedload(models.User.vip_level)).filter(column == identifier).first()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def _find_user_id(db: Session, user_id: str):
+    return db.query(models.User.id).filter(models.User.id == user_id).first()
 
-@router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = get_password_hash(user.password)
+def _email_registered(db: Session, email: str) -> bool:
+    return db.query(models.User.id).filter(models.User.email == email).first() is not None
+
+def _create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -35,81 +35,87 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_d
     )
     
     db.add(db_user)
+    rollup.record_user(db)
     db.commit()
     db.refresh(db_user)
     return db_user
 
+@router.post("/register", response_model=schemas.User)
+async def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
+    if await run_in_threadpool(_email_registered, db, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await passwords.hash_password(user.password)
+    return await run_in_threadpool(_create_user, db, user, hashed_password)
+
 @router.post("/login", response_model=schemas.User)
-def login_user(user: schemas.UserLogin, db: Session = Depends(database.get_db)):
+async def login_user(user: schemas.UserLogin, db: Session = Depends(database.get_db)):
     # Check if identifier is email or phone
-    db_user = db.query(models.User).filter(
-        (models.User.email == user.identifier) | (models.User.phone == user.identifier)
-    ).first()
+    db_user = await run_in_threadpool(_find_user, db, user.identifier)
     
     if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect email/phone or password")
-    if not verify_password(user.password, db_user.password):
+    if not await passwords.check_password(user.password, db_user.password):
         raise HTTPException(status_code=400, detail="Incorrect email/phone or password")
         
     return db_user
 
 
 
-@router.put("/{user_id}", response_model=schemas.User)
-def update_user(user_id: str, user_update: schemas.UserUpdate, db: Session = Depends(database.get_db)):
+def _update_user(db: Session, user_id: str, update_data: dict):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    update_data = user_update.dict(exclude_unset=True)
-    
-    if "password" in update_data:
-        update_data["password"] = get_password_hash(update_data["password"])
         
     for key, value in update_data.items():
         setattr(db_user, key, value)
         
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    return db.query(models.User).options(joinedload(models.User.vip_level)).filter(models.User.id == user_id).first()
 
-@router.post("/{user_id}/avatar", response_model=schemas.User)
-def upload_avatar(user_id: str, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
+@router.put("/{user_id}", response_model=schemas.User)
+async def update_user(user_id: str, user_update: schemas.UserUpdate, db: Session = Depends(database.get_db)):
+    update_data = user_update.dict(exclude_unset=True)
     
-    # Save file
-    upload_dir = "uploads"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
+    if "password" in update_data:
+        update_data["password"] = await passwords.hash_password(update_data["password"])
         
-    file_extension = os.path.splitext(file.filename)[1]
-    file_name = f"avatar_{user_id}{file_extension}"
-    file_path = os.path.join(upload_dir, file_name)
+    return await run_in_threadpool(_update_user, db, user_id, update_data)
+
+def _set_avatar(db: Session, user_id: str, avatar_url: str):
+    db_user = db.query(models.User).options(joinedload(models.User.vip_level)).filter(models.User.id == user_id).first()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Update user avatar URL
-    # Assuming backend runs on localhost:8000
-    avatar_url = f"http://localhost:8000/uploads/{file_name}"
     db_user.avatar = avatar_url
-    
-    db.commit()
-    db.refresh(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-@router.post("/reset-password")
-def reset_password(user_data: schemas.UserResetPassword, db: Session = Depends(database.get_db)):
+@router.post("/{user_id}/avatar", response_model=schemas.User)
+async def upload_avatar(user_id: str, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
+    if not await run_in_threadpool(_find_user_id, db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Save file under its content hash
+    key = await upload_store.save_image(file)
+    return await run_in_threadpool(_set_avatar, db, user_id, upload_store.url_for(key))
+
+def _find_reset_user(db: Session, user_data: schemas.UserResetPassword):
     user = db.query(models.User).filter(models.User.username == user_data.username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.email != user_data.email:
         raise HTTPException(status_code=400, detail="Email does not match")
-    
-    user.password = get_password_hash(user_data.new_password)
+    return user
+
+def _set_password(db: Session, user, hashed_password: str):
+    user.password = hashed_password
     db.commit()
+
+@router.post("/reset-password")
+async def reset_password(user_data: schemas.UserResetPassword, db: Session = Depends(database.get_db)):
+    user = await run_in_threadpool(_find_reset_user, db, user_data)
+    hashed_password = await passwords.hash_password(user_data.new_password)
+    await run_in_threadpool(_set_password, db, user, hashed_password)
     return {"message": "Password updated successfully"}
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, field_validator
-from typing import List, Optional
+from pydantic import BaseModel, computed_field, field_validator
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
+from . import image_variants
 
 class ProductBase(BaseModel):
     name: str
@@ -39,6 +40,19 @@ class Product(ProductBase):
         orm_mode = True
         from_attributes = True
 
+    # thumb / medium / webp URLs for the main image, or None when the image
+    # has no renditions (see app/image_variants.py)
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[Dict[str, str]]:
+        return image_variants.variant_urls(self.image)
+
+    # The same for each gallery image, in the order of images
+    @computed_field
+    @property
+    def images_variants(self) -> List[Optional[Dict[str, str]]]:
+        return [image_variants.variant_urls(url) for url in self.images]
+
     @staticmethod
     def _extract_images(v):
         if not v: return []
@@ -72,10 +86,11 @@ class Product(ProductBase):
         return v
 
 class ProductPagination(BaseModel):
-    total: int
+    total: Optional[int] = None
     items: List[Product]
-    page: int
+    page: Optional[int] = None
     size: int
+    next_cursor: Optional[str] = None
 
 
 
@@ -190,12 +205,23 @@ class CartItem(CartItemBase):
     class Config:
         from_attributes = True
 
+class CartOperation(BaseModel):
+    op: Literal["add", "update", "remove"]
+    product_id: str
+    quantity: int = 1
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation]
+
 class FavoriteBase(BaseModel):
     product_id: str
 
 class FavoriteCreate(FavoriteBase):
     pass
 
+class FavoriteContains(BaseModel):
+    product_ids: List[str]
+
 class Favorite(FavoriteBase):
     id: int
     create_time: datetime
@@ -321,6 +347,12 @@ class ShippingWithOrder(Shipping):
     class Config:
         from_attributes = True
 
+class OrderWithShipping(Order):
+    shipping: Optional[Shipping] = None
+
+    class Config:
+        from_attributes = True
+
 class UserAdminView(User):
     orders_count: int = 0
     total_spent: float = 0.0
@@ -354,3 +386,27 @@ class Banner(BannerBase):
 
     class Config:
         from_attributes = True
+
+class ProductImportJob(BaseModel):
+    id: str
+    filename: Optional[str] = None
+    status: str
+    processed_rows: int = 0
+    created_count: int = 0
+    error_count: int = 0
+    errors: List[str] = []
+    create_time: datetime
+    finish_time: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+    @field_validator('errors', mode='before')
+    @classmethod
+    def parse_errors(cls, v):
+        if isinstance(v, str):
+            try:
+                return json.loads(v)
+            except:
+                return []
+        return v or []
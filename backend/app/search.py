@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, false, func, or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Inverted index for product search.
+#
+# CJK text has no word boundaries, so runs of CJK characters are indexed as
+# overlapping character bigrams ("优质狗粮" -> 优质, 质狗, 狗粮) plus the last
+# character of the run on its own. The trailing unigram means every character
+# is the first character of at least one term, so a single-character query can
+# be answered with an index range scan (term LIKE '狗%'). Runs of letters and
+# digits are indexed as whole lowercase words and matched by prefix.
+
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+MAX_TERM_LENGTH = 32
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"([{_CJK}]+)|((?:(?![{_CJK}])[^\W_])+)")
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(_normalize(text)):
+        if cjk:
+            terms.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            terms.append(cjk[-1])
+        else:
+            terms.append(word[:MAX_TERM_LENGTH])
+    return terms
+
+
+def _query_terms(q: str) -> List[str]:
+    # A query only needs its bigrams; the trailing unigram of a CJK run is
+    # implied by the bigram ending in it. Single characters and words are kept
+    # and matched by prefix.
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(_normalize(q)):
+        if cjk:
+            if len(cjk) == 1:
+                terms.append(cjk)
+            else:
+                terms.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            terms.append(word[:MAX_TERM_LENGTH])
+    return list(dict.fromkeys(terms))
+
+
+def _is_prefix_term(term: str) -> bool:
+    return len(term) == 1 or not _TOKEN_RE.fullmatch(term).group(1)
+
+
+def product_terms(name: Optional[str], description: Optional[str]) -> Dict[str, int]:
+    weights = Counter()
+    for term in tokenize(name):
+        weights[term] += NAME_WEIGHT
+    for term in tokenize(description):
+        weights[term] += DESCRIPTION_WEIGHT
+    return dict(weights)
+
+
+def term_rows(product_id: str, name: Optional[str], description: Optional[str]) -> List[dict]:
+    # Index rows for one product, ready for bulk_insert_mappings
+    return [
+        {"term": term, "product_id": product_id, "weight": weight}
+        for term, weight in product_terms(name, description).items()
+    ]
+
+
+def index_products(db: Session, products: Iterable[models.Product]):
+    # (Re)index products in the caller's transaction. Products must already
+    # have ids (flush first if they were just added).
+    rows = []
+    product_ids = []
+    for product in products:
+        product_ids.append(product.id)
+        rows.extend(term_rows(product.id, product.name, product.description))
+
+    if product_ids:
+        remove_products(db, product_ids)
+    if rows:
+        db.bulk_insert_mappings(models.ProductSearchTerm, rows)
+
+
+def index_product(db: Session, product: models.Product):
+    index_products(db, [product])
+
+
+def remove_products(db: Session, product_ids: List[str]):
+    db.query(models.ProductSearchTerm).filter(
+        models.ProductSearchTerm.product_id.in_(product_ids)
+    ).delete(synchronize_session=False)
+
+
+def rebuild_index(db: Session, batch_size: int = 1000):
+    db.query(models.ProductSearchTerm).delete(synchronize_session=False)
+    query = db.query(models.Product.id, models.Product.name, models.Product.description)
+    batch = []
+    count = 0
+    for product_id, name, description in query.yield_per(batch_size):
+        batch.extend(term_rows(product_id, name, description))
+        count += 1
+        if len(batch) >= batch_size:
+            db.bulk_insert_mappings(models.ProductSearchTerm, batch)
+            batch = []
+    if batch:
+        db.bulk_insert_mappings(models.ProductSearchTerm, batch)
+    db.commit()
+    return count
+
+
+def match_subquery(db: Session, q: Optional[str]):
+    # Returns a subquery of (product_id, score) for products containing every
+    # query term, or None if the query has no searchable terms.
+    terms = _query_terms(q or "")
+    if not terms:
+        return None
+
+    term_col = models.ProductSearchTerm.term
+    conditions = [
+        term_col.like(f"{t}%") if _is_prefix_term(t) else term_col == t
+        for t in terms
+    ]
+    # One posting can satisfy several query terms when they overlap ("dog
+    # dogfood"), so each term is checked on its own: the HAVING clause
+    # requires every term to have matched at least one posting.
+    matched = [func.max(case((cond, 1), else_=0)) == 1 for cond in conditions]
+
+    return (
+        db.query(
+            models.ProductSearchTerm.product_id.label("product_id"),
+            func.sum(models.ProductSearchTerm.weight).label("score"),
+        )
+        .filter(or_(*conditions))
+        .group_by(models.ProductSearchTerm.product_id)
+        .having(and_(*matched))
+        .subquery()
+    )
+
+
+def apply_search(db: Session, query, q: Optional[str]):
+    # Restrict a Product query to search hits. Returns the query and the
+    # relevance score column (None if q has no searchable terms) for ordering.
+    # A query made only of punctuation matches nothing.
+    hits = match_subquery(db, q)
+    if hits is None:
+        return (query.filter(false()) if q and q.strip() else query), None
+    return query.join(hits, hits.c.product_id == models.Product.id), hits.c.score
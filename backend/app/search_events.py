@@ -0,0 +1,218 @@
+import atexit
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+
+from . import models, database
+
+# Search event ingestion.
+#
+# POST /products/search-history only appends to an in-process buffer. A
+# background thread batch-inserts the buffer into search_history every
+# SEARCH_HISTORY_FLUSH_MS milliseconds, or as soon as SEARCH_HISTORY_BATCH
+# events are waiting. If the database is unavailable events are kept up to
+# SEARCH_HISTORY_MAX_PENDING and newer ones are dropped beyond that; a batch
+# that keeps failing is dropped after MAX_RETRIES attempts.
+#
+# Every event also feeds a Space-Saving heavy-hitters summary which answers
+# GET /products/trending-searches from memory. Two summaries cover the current
+# and the previous TRENDING_WINDOW seconds, so old spikes age out. The counts
+# are per worker and start empty after a restart.
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = int(os.getenv("SEARCH_HISTORY_FLUSH_MS", "1000")) / 1000
+BATCH_SIZE = int(os.getenv("SEARCH_HISTORY_BATCH", "500"))
+MAX_PENDING = int(os.getenv("SEARCH_HISTORY_MAX_PENDING", "50000"))
+MAX_RETRIES = 3
+TRENDING_CAPACITY = int(os.getenv("TRENDING_CAPACITY", "1000"))
+TRENDING_WINDOW = float(os.getenv("TRENDING_WINDOW", "3600"))
+
+
+def normalize(keyword: str) -> str:
+    return " ".join(keyword.split()).lower()[:100]
+
+
+class SpaceSaving:
+    # Keeps at most `capacity` counters. An unseen keyword replaces the
+    # smallest counter and inherits its count as an over-estimate (error), so
+    # any keyword with more than total/capacity hits is guaranteed to be kept.
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: Dict[str, List[int]] = {}  # keyword -> [count, error]
+        self._heap: List[Tuple[int, str]] = []  # (count, keyword), may hold stale entries
+
+    def add(self, keyword: str, count: int = 1):
+        self.total += count
+        counter = self.counts.get(keyword)
+        if counter is None:
+            if len(self.counts) < self.capacity:
+                counter = self.counts[keyword] = [0, 0]
+            else:
+                smallest = self._pop_smallest()
+                counter = self.counts[keyword] = [smallest, smallest]
+        counter[0] += count
+        heapq.heappush(self._heap, (counter[0], keyword))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_smallest(self) -> int:
+        while True:
+            count, keyword = heapq.heappop(self._heap)
+            counter = self.counts.get(keyword)
+            if counter is not None and counter[0] == count:
+                del self.counts[keyword]
+                return count
+
+
+class TrendingSearches:
+    def __init__(self, capacity: int = TRENDING_CAPACITY, window: float = TRENDING_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self._current = SpaceSaving(capacity)
+        self._previous = SpaceSaving(capacity)
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            # After a long idle gap the previous window is stale as well
+            stale = now - self._window_start >= 2 * self.window
+            self._previous = SpaceSaving(self.capacity) if stale else self._current
+            self._current = SpaceSaving(self.capacity)
+            self._window_start = now
+
+    def add(self, keyword: str):
+        with self._lock:
+            self._rotate()
+            self._current.add(keyword)
+
+    def top(self, n: int = 10) -> List[dict]:
+        with self._lock:
+            self._rotate()
+            merged = {}
+            for summary in (self._previous, self._current):
+                for keyword, (count, error) in summary.counts.items():
+                    total = merged.setdefault(keyword, [0, 0])
+                    total[0] += count
+                    total[1] += error
+        ranked = heapq.nlargest(n, merged.items(), key=lambda item: item[1][0])
+        return [{"keyword": keyword, "count": count, "error": error} for keyword, (count, error) in ranked]
+
+
+class SearchHistoryBuffer:
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, batch_size: int = BATCH_SIZE, max_pending: int = MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._failures = 0
+        self._rows: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, user_id: str, keyword: str):
+        with self._lock:
+            if len(self._rows) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._rows.append({"user_id": user_id, "keyword": keyword, "search_time": datetime.utcnow()})
+            full = len(self._rows) >= self.batch_size
+        self._start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            db = database.SessionLocal()
+            try:
+                try:
+                    db.execute(insert(models.SearchHistory), rows)
+                    db.commit()
+                    self.written += len(rows)
+                    self._failures = 0
+                except Exception:
+                    db.rollback()
+                    self._insert_one_by_one(db, rows)
+                self.batches += 1
+            finally:
+                db.close()
+
+    def _insert_one_by_one(self, db, rows: List[dict]):
+        # A bad row (e.g. an unknown user_id) should not sink the whole batch;
+        # if the database itself is failing, keep the rows for the next flush
+        failed = []
+        for row in rows:
+            try:
+                db.execute(insert(models.SearchHistory), [row])
+                db.commit()
+                self.written += 1
+            except Exception:
+                db.rollback()
+                failed.append(row)
+        if failed and len(failed) == len(rows) and self._failures < MAX_RETRIES:
+            self._failures += 1
+            logger.error("Failed to write %d search history rows, will retry", len(rows))
+            with self._lock:
+                keep = max(self.max_pending - len(self._rows), 0)
+                self.dropped += max(len(failed) - keep, 0)
+                self._rows[:0] = failed[:keep]
+        else:
+            self._failures = 0
+            self.dropped += len(failed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._rows)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="search-history-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Search history flush failed")
+
+
+history_buffer = SearchHistoryBuffer()
+trending = TrendingSearches()
+
+
+def record(user_id: str, keyword: str):
+    history_buffer.add(user_id, keyword)
+    keyword = normalize(keyword)
+    if keyword:
+        trending.add(keyword)
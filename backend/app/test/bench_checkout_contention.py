@@ -0,0 +1,89 @@
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Checkout contention benchmark: many users buy the same hot product at once.
+# Run against a live server:
+#   python bench_checkout_contention.py [users] [stock] [threads]
+# Afterwards stock + sold must equal the starting stock (no overselling).
+
+BASE_URL = "http://localhost:8001"
+
+
+def create_hot_product(stock, tag):
+    response = requests.post(f"{BASE_URL}/admin/products/", json={
+        "name": f"秒杀商品 {tag}",
+        "category": "食品",
+        "price": 9.9,
+        "stock": stock,
+        "image": "",
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def prepare_user(product_id):
+    name = f"bench_{uuid.uuid4().hex[:10]}"
+    response = requests.post(f"{BASE_URL}/users/register", json={
+        "username": name, "email": f"{name}@example.com", "password": "bench123",
+    })
+    response.raise_for_status()
+    user_id = response.json()["id"]
+    requests.post(f"{BASE_URL}/cart/{user_id}", json={"product_id": product_id, "quantity": 1}).raise_for_status()
+    return user_id
+
+
+def checkout(user_id):
+    start = time.perf_counter()
+    response = requests.post(f"{BASE_URL}/orders/{user_id}", json={
+        "payment_method": "wechat", "address": {"name": "bench"},
+    })
+    return response.status_code, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    tag = uuid.uuid4().hex[:8]
+    product_id = create_hot_product(stock, tag)
+    print(f"Preparing {users} users with the hot product in their cart...")
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        user_ids = list(pool.map(lambda _: prepare_user(product_id), range(users)))
+
+    print(f"Checking out with {threads} threads...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(checkout, user_ids))
+    elapsed = time.perf_counter() - start
+
+    ok = [latency for code, latency in results if code == 200]
+    sold_out = sum(1 for code, _ in results if code == 400)
+    failed = len(results) - len(ok) - sold_out
+    print(f"Elapsed: {elapsed:.2f}s  Throughput: {len(results) / elapsed:.1f} checkouts/s")
+    print(f"Orders: {len(ok)}  Sold out: {sold_out}  Errors: {failed}")
+    latencies = [latency for _, latency in results]
+    print(f"Latency p50: {percentile(latencies, 0.5) * 1000:.1f}ms  "
+          f"p95: {percentile(latencies, 0.95) * 1000:.1f}ms  "
+          f"p99: {percentile(latencies, 0.99) * 1000:.1f}ms")
+
+    items = requests.get(f"{BASE_URL}/admin/products/", params={"q": tag}).json()["items"]
+    product = next(item for item in items if item["id"] == product_id)
+    print(f"Stock left: {product['stock']}  Sales: {product['sales']}")
+    if product["stock"] + product["sales"] != stock or product["sales"] != len(ok):
+        print("Inconsistent stock/sales!")
+    else:
+        print("Stock is consistent.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import schemas
+from app.json_response import FastJSONResponse, validate_many
+
+# JSON encoding benchmark: FastAPI's default response path against
+# FastJSONResponse for pages of orders (with items, products and user) and
+# products. The rows are in-memory stand-ins for ORM objects, so only
+# validation and serialization are measured.
+#   python bench_json_encoding.py [page size] [requests]
+
+
+def make_product(i):
+    return SimpleNamespace(
+        id=f"product-{i}", name=f"宠物商品 {i}", price=19.9 + i, category="食品",
+        image=f"https://images.unsplash.com/photo-{i}?w=1080", description="天然配方，营养均衡" * 4,
+        rating=4.5, sales=i * 3, stock=100, status="上架",
+        images=[SimpleNamespace(url=f"https://example.com/{i}/{n}.jpg") for n in range(3)],
+        specs=[SimpleNamespace(spec=f"规格 {n}") for n in range(2)],
+    )
+
+
+def make_order(i, products):
+    user = SimpleNamespace(
+        id=f"user-{i % 50}", username=f"user{i % 50}", email=f"user{i % 50}@example.com", phone="13800000000",
+        avatar=None, role="user", is_active=True, vip_level_id=None, vip_level=None,
+        register_time=datetime(2024, 1, 1),
+    )
+    items = [
+        SimpleNamespace(id=i * 10 + n, product_id=product.id, quantity=n + 1, price=product.price, product=product)
+        for n, product in enumerate(products[i % 20:i % 20 + 4])
+    ]
+    return SimpleNamespace(
+        id=f"order-{i}", order_number=f"PET{i:019d}", user_id=user.id, payment_method="alipay",
+        total_amount=sum(item.price * item.quantity for item in items),
+        create_time=datetime(2024, 6, 1) + timedelta(minutes=i), status="paid",
+        address_snapshot=json.dumps({"name": "张三", "phone": "13800000000", "detail": "北京市朝阳区"}, ensure_ascii=False),
+        address=None, user=user, items=items,
+    )
+
+
+def build_app(orders, products):
+    app = FastAPI()
+
+    @app.get("/default/orders", response_model=dict)
+    def default_orders():
+        return {"total": len(orders), "items": [schemas.Order.from_orm(o) for o in orders],
+                "page": 1, "size": len(orders), "next_cursor": None}
+
+    @app.get("/fast/orders", response_model=dict)
+    def fast_orders():
+        return FastJSONResponse({"total": len(orders), "items": validate_many(schemas.Order, orders),
+                                 "page": 1, "size": len(orders), "next_cursor": None})
+
+    @app.get("/default/products", response_model=List[schemas.Product])
+    def default_products():
+        return products
+
+    @app.get("/fast/products", response_model=List[schemas.Product])
+    def fast_products():
+        return FastJSONResponse(validate_many(schemas.Product, products))
+
+    return app
+
+
+def timed(client, path, requests):
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        body = client.get(path).content
+    return (time.perf_counter() - start) / requests * 1000, body
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    products = [make_product(i) for i in range(size)]
+    orders = [make_order(i, products) for i in range(size)]
+    client = TestClient(build_app(orders, products))
+
+    for name in ("orders", "products"):
+        default_ms, default_body = timed(client, f"/default/{name}", requests)
+        fast_ms, fast_body = timed(client, f"/fast/{name}", requests)
+        assert json.loads(default_body) == json.loads(fast_body), f"{name}: bodies differ"
+        print(f"{size} {name}: default {default_ms:.2f} ms, fast {fast_ms:.2f} ms "
+              f"({default_ms / fast_ms:.1f}x), {len(fast_body) / 1024:.0f} KB")
+    print("Bodies match.")
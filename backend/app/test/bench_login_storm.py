@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Login storm benchmark: fire many concurrent logins and measure login
+# throughput together with the latency of an unrelated endpoint, before and
+# during the storm. With bcrypt in the password process pool the probe
+# latency should stay close to its baseline. Run against a live server:
+#   python bench_login_storm.py [logins] [threads]
+
+BASE_URL = "http://localhost:8001"
+PROBE_URL = f"{BASE_URL}/admin/categories/"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0
+
+
+def probe(stop, latencies):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(PROBE_URL)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.02)
+
+
+def measure_probe(seconds):
+    stop, latencies = threading.Event(), []
+    thread = threading.Thread(target=probe, args=(stop, latencies))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label}: p50 {percentile(latencies, 0.5) * 1000:.1f}ms  "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f}ms  "
+          f"max {max(latencies) * 1000 if latencies else 0:.1f}ms  ({len(latencies)} requests)")
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    name = f"storm_{uuid.uuid4().hex[:10]}"
+    email = f"{name}@example.com"
+    requests.post(f"{BASE_URL}/users/register", json={
+        "username": name, "email": email, "password": "storm123",
+    }).raise_for_status()
+
+    report("Probe baseline", measure_probe(3))
+
+    stop, latencies = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(stop, latencies))
+    prober.start()
+
+    def login(_):
+        return requests.post(f"{BASE_URL}/users/login", json={"identifier": email, "password": "storm123"}).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        codes = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    print(f"Logins: {logins} in {elapsed:.2f}s ({logins / elapsed:.1f}/s)  "
+          f"ok: {codes.count(200)}  busy (503): {codes.count(503)}  other: {len(codes) - codes.count(200) - codes.count(503)}")
+    report("Probe during storm", latencies)
+
+
+if __name__ == "__main__":
+    main()
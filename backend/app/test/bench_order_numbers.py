@@ -0,0 +1,42 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.order_numbers import OrderNumberGenerator
+
+# Order number generator benchmark: ids per second in one thread and across
+# threads sharing one generator, plus uniqueness/monotonicity checks.
+#   python bench_order_numbers.py [count] [threads]
+
+
+def single_thread(count):
+    generator = OrderNumberGenerator(1)
+    start = time.perf_counter()
+    ids = [generator.next_id() for _ in range(count)]
+    elapsed = time.perf_counter() - start
+    print(f"1 thread:  {count / elapsed / 1e6:.2f}M ids/s")
+    assert all(a < b for a, b in zip(ids, ids[1:])), "ids are not monotonic"
+    numbers = [generator.next() for _ in range(1000)]
+    assert numbers == sorted(numbers), "order numbers do not sort in order"
+
+
+def multi_thread(count, threads):
+    generator = OrderNumberGenerator(2)
+    per_thread = count // threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        batches = list(pool.map(lambda _: [generator.next_id() for _ in range(per_thread)], range(threads)))
+    elapsed = time.perf_counter() - start
+    total = per_thread * threads
+    print(f"{threads} threads: {total / elapsed / 1e6:.2f}M ids/s")
+    assert len({i for batch in batches for i in batch}) == total, "duplicate ids"
+    for batch in batches:
+        assert all(a < b for a, b in zip(batch, batch[1:])), "ids are not monotonic per thread"
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    single_thread(count)
+    multi_thread(count, threads)
+    print("All ids unique and ordered.")
@@ -0,0 +1,26 @@
+import os
+from app import upload_store, image_variants
+
+# Generate thumbnail/medium/WebP renditions for every image already in the
+# upload store (requires Pillow). Existing renditions are skipped.
+def generate_all():
+    if image_variants.Image is None:
+        print("Pillow is not installed; pip install Pillow first.")
+        return
+    count = 0
+    for root, _, files in os.walk(upload_store.STORE_DIR):
+        for name in files:
+            # Originals only: <sha256><ext>, no variant suffix
+            if not upload_store.KEY_RE.match(name) or "_" in name:
+                continue
+            if os.path.splitext(name)[1] not in upload_store.IMAGE_EXTENSIONS:
+                continue
+            try:
+                image_variants.generate(name)
+                count += 1
+            except Exception as e:
+                print(f"Failed to process {name}: {e}")
+    print(f"Processed {count} images.")
+
+if __name__ == "__main__":
+    generate_all()
@@ -1,5 +1,5 @@
 from app.database import SessionLocal, engine
-from app import models
+from app import models, search, category_stats
 import json
 
 # Recreate tables to apply schema changes
@@ -250,5 +250,7 @@ for p in products_data:
             db.add(db_spec)
 
 db.commit()
+search.rebuild_index(db)
+category_stats.reconcile(db)
 db.close()
 print("Data seeded successfully")
@@ -0,0 +1,81 @@
+import uuid
+
+import requests
+
+from app.database import SessionLocal
+from app.models import UserStats
+
+BASE_URL = "http://localhost:8001"
+
+# Checks that the paid totals in the dashboard and in the user's user_stats row
+# follow order status changes in any order, not only pending -> paid. Run it
+# with the same database settings as the server; it creates a throwaway
+# product and user and deletes them again at the end.
+
+def paid_sales():
+    return requests.get(f"{BASE_URL}/admin/dashboard/stats").json()["paid_sales"]
+
+def user_paid(user_id):
+    db = SessionLocal()
+    try:
+        stats = db.get(UserStats, user_id)
+        return stats.paid_spent if stats else 0.0
+    finally:
+        db.close()
+
+def create_order(user_id, product_id):
+    requests.post(f"{BASE_URL}/cart/{user_id}", json={"product_id": product_id, "quantity": 1})
+    response = requests.post(f"{BASE_URL}/orders/{user_id}", json={"payment_method": "wechat", "address": {}})
+    response.raise_for_status()
+    return response.json()
+
+def set_status(order_id, status):
+    response = requests.put(f"{BASE_URL}/admin/orders/{order_id}/status", json={"status": status})
+    response.raise_for_status()
+
+def check(label, expected, actual):
+    ok = abs(expected - actual) < 1e-6
+    print(f"{'Success' if ok else 'Failed'}: {label} (expected {expected}, got {actual})")
+    return ok
+
+def test_shipped_then_deleted(user_id, product_id):
+    print("Testing pending -> shipped -> delete...")
+    before = paid_sales()
+    order = create_order(user_id, product_id)
+    set_status(order["id"], "shipped")
+    ok = check("shipped order counts as paid", before + order["total_amount"], paid_sales())
+    ok = check("and as paid for the user", order["total_amount"], user_paid(user_id)) and ok
+    requests.delete(f"{BASE_URL}/admin/orders/{order['id']}").raise_for_status()
+    ok = check("deleting it takes the payment off", before, paid_sales()) and ok
+    return check("and off the user's totals", 0.0, user_paid(user_id)) and ok
+
+def test_paid_then_cancelled(user_id, product_id):
+    print("Testing paid -> cancelled...")
+    before = paid_sales()
+    order = create_order(user_id, product_id)
+    requests.post(f"{BASE_URL}/orders/{order['id']}/pay").raise_for_status()
+    set_status(order["id"], "cancelled")
+    ok = check("cancelling takes the payment off", before, paid_sales())
+    ok = check("and off the user's totals", 0.0, user_paid(user_id)) and ok
+    requests.delete(f"{BASE_URL}/admin/orders/{order['id']}").raise_for_status()
+    ok = check("deleting a cancelled order leaves paid totals alone", before, paid_sales()) and ok
+    return check("and the user's totals too", 0.0, user_paid(user_id)) and ok
+
+if __name__ == "__main__":
+    suffix = uuid.uuid4().hex[:8]
+    product = requests.post(f"{BASE_URL}/admin/products/", json={
+        "name": f"Order stats test {suffix}", "price": 2.0, "category": "test",
+        "image": "", "description": "", "stock": 10,
+    }).json()
+    user = requests.post(f"{BASE_URL}/users/register", json={
+        "username": f"order_stats_{suffix}", "email": f"order_stats_{suffix}@example.com", "password": suffix,
+    }).json()
+    try:
+        results = [
+            test_shipped_then_deleted(user["id"], product["id"]),
+            test_paid_then_cancelled(user["id"], product["id"]),
+        ]
+        print("All checks passed." if all(results) else "Some checks failed.")
+    finally:
+        requests.delete(f"{BASE_URL}/admin/users/{user['id']}")
+        requests.delete(f"{BASE_URL}/admin/products/{product['id']}")
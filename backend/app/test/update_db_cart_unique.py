@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine, text
+from app.database import SQLALCHEMY_DATABASE_URL
+
+# One cart_items row per (user_id, product_id): merge existing duplicates into
+# the oldest row, then add the unique constraint
+
+
+def update_db():
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    with engine.connect() as connection:
+        duplicates = connection.execute(text(
+            "SELECT user_id, product_id, MIN(id), SUM(quantity) FROM cart_items "
+            "GROUP BY user_id, product_id HAVING COUNT(*) > 1"
+        )).all()
+        print(f"Merging {len(duplicates)} duplicated cart lines...")
+        for user_id, product_id, keep_id, quantity in duplicates:
+            connection.execute(
+                text("UPDATE cart_items SET quantity = :quantity WHERE id = :id"),
+                {"quantity": quantity, "id": keep_id},
+            )
+            connection.execute(
+                text("DELETE FROM cart_items WHERE user_id = :user_id AND product_id = :product_id AND id <> :id"),
+                {"user_id": user_id, "product_id": product_id, "id": keep_id},
+            )
+        connection.commit()
+
+        print("Adding unique constraint uq_cart_items_user_product...")
+        try:
+            connection.execute(text(
+                "ALTER TABLE cart_items ADD CONSTRAINT uq_cart_items_user_product UNIQUE (user_id, product_id)"
+            ))
+            connection.commit()
+        except Exception as e:
+            if "Duplicate key name" in str(e):
+                print("Constraint already exists.")
+            else:
+                print(f"Error adding constraint: {e}")
+    print("Done!")
+
+if __name__ == "__main__":
+    update_db()
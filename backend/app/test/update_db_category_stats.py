@@ -0,0 +1,17 @@
+from app.database import engine, SessionLocal, Base
+from app.models import CategoryStats
+from app import category_stats
+
+# Backfill category_stats. The API also reconciles it at startup and every
+# CATEGORY_RECONCILE_INTERVAL seconds; this runs the same recount on demand.
+print("Creating category_stats table...")
+Base.metadata.create_all(bind=engine, tables=[CategoryStats.__table__])
+
+print("Reconciling category product counts...")
+db = SessionLocal()
+try:
+    fixed = category_stats.reconcile(db)
+    print(f"Corrected {fixed} categories.")
+finally:
+    db.close()
+print("Done!")
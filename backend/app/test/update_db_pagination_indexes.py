@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, text
+from app.database import SQLALCHEMY_DATABASE_URL
+
+# Composite (sort column, id) indexes used by cursor pagination
+INDEXES = [
+    ("products", "ix_products_sales_id", "sales, id"),
+    ("orders", "ix_orders_create_time_id", "create_time, id"),
+    ("orders", "ix_orders_total_amount_id", "total_amount, id"),
+]
+
+def update_db():
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    with engine.connect() as connection:
+        for table, name, columns in INDEXES:
+            print(f"Creating index {name} on {table}...")
+            try:
+                connection.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+                connection.commit()
+            except Exception as e:
+                if "Duplicate key name" in str(e):
+                    print(f"Index {name} already exists.")
+                else:
+                    print(f"Error creating index: {e}")
+    print("Done!")
+
+if __name__ == "__main__":
+    update_db()
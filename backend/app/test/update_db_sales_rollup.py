@@ -0,0 +1,18 @@
+from app.database import engine, SessionLocal, Base
+from app.models import DailySales
+from app import rollup
+
+# daily_sales only holds counters derived from orders and users, so the table
+# is recreated (its primary key is now day + slot) and rebuilt from them.
+print("Recreating daily_sales table...")
+DailySales.__table__.drop(bind=engine, checkfirst=True)
+Base.metadata.create_all(bind=engine, tables=[DailySales.__table__])
+
+print("Rebuilding daily sales rollup...")
+db = SessionLocal()
+try:
+    days = rollup.rebuild(db)
+    print(f"Rebuilt {days} days.")
+finally:
+    db.close()
+print("Done!")
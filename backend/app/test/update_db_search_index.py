@@ -0,0 +1,15 @@
+from app.database import engine, SessionLocal, Base
+from app.models import ProductSearchTerm
+from app import search
+
+print("Creating product_search_terms table...")
+Base.metadata.create_all(bind=engine, tables=[ProductSearchTerm.__table__])
+
+print("Rebuilding product search index...")
+db = SessionLocal()
+try:
+    count = search.rebuild_index(db)
+    print(f"Indexed {count} products.")
+finally:
+    db.close()
+print("Done!")
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, text
+from app.database import SQLALCHEMY_DATABASE_URL
+
+# Index on users.phone for phone-number login
+def update_db():
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    with engine.connect() as connection:
+        print("Creating index ix_users_phone on users...")
+        try:
+            connection.execute(text("CREATE INDEX ix_users_phone ON users (phone)"))
+            connection.commit()
+        except Exception as e:
+            if "Duplicate key name" in str(e):
+                print("Index ix_users_phone already exists.")
+            else:
+                print(f"Error creating index: {e}")
+    print("Done!")
+
+if __name__ == "__main__":
+    update_db()
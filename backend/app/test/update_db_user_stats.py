@@ -0,0 +1,17 @@
+from app.database import engine, SessionLocal, Base
+from app.models import UserStats
+from app import user_stats
+
+# Backfill user_stats, then set USE_USER_STATS_TABLE=true to let the admin
+# user list read it
+print("Creating user_stats table...")
+Base.metadata.create_all(bind=engine, tables=[UserStats.__table__])
+
+print("Rebuilding user stats...")
+db = SessionLocal()
+try:
+    count = user_stats.rebuild(db)
+    print(f"Rebuilt stats for {count} users.")
+finally:
+    db.close()
+print("Done!")
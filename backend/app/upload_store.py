@@ -0,0 +1,70 @@
+import hashlib
+import os
+import re
+import uuid
+
+import anyio
+from fastapi import HTTPException, UploadFile
+
+# Content-addressed upload store for product images and avatars.
+#
+# An upload is streamed to a temporary file in CHUNK_SIZE pieces through
+# anyio's worker-thread file API, hashed with SHA-256 as it is written, then
+# renamed to <STORE_DIR>/<first 2 hex>/<sha256><ext>. Identical files
+# therefore share one copy on disk, and a stored file never changes, so it
+# is served from /media/<sha256><ext> with a one-year immutable Cache-Control
+# (see routers/media.py). Files are never overwritten or deleted.
+
+STORE_DIR = os.getenv("UPLOAD_STORE_DIR", os.path.join("uploads", "objects"))
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8001")
+CHUNK_SIZE = 256 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+# <sha256><ext>, or <sha256>_<variant><ext> for image_variants renditions
+KEY_RE = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+
+
+def path_for(key: str) -> str:
+    return os.path.join(STORE_DIR, key[:2], key)
+
+
+def url_for(key: str) -> str:
+    return f"{PUBLIC_BASE_URL}/media/{key}"
+
+
+async def save_image(file: UploadFile) -> str:
+    # Store an uploaded image and return its key (<sha256><ext>)
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Only image files are allowed")
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    temp_path = os.path.join(STORE_DIR, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(temp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="File too large")
+                digest.update(chunk)
+                await buffer.write(chunk)
+
+        key = f"{digest.hexdigest()}{extension}"
+        path = path_for(key)
+        if os.path.exists(path):
+            # Already stored: keep the existing copy
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return key
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,58 @@
+import os
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from . import models, counters
+
+# Denormalized per-user order totals (user_stats table).
+#
+# Order creation, status changes and deletion keep the row current in the
+# same transaction, through app/order_stats.py. When USE_USER_STATS_TABLE is
+# enabled the admin user list joins this table instead of aggregating orders,
+# which makes sorting and filtering by spend an indexed lookup. Run rebuild()
+# (update_db_user_stats.py) before enabling it on an existing database.
+
+ENABLED = os.getenv("USE_USER_STATS_TABLE", "false").lower() in ("1", "true", "yes")
+
+COUNTERS = ("orders_count", "total_spent", "paid_count", "paid_spent")
+
+
+def _add(db: Session, user_id: str, deltas: dict):
+    if user_id:
+        counters.add(db, models.UserStats.__table__, {"user_id": user_id}, deltas, COUNTERS)
+
+
+def record_order(db: Session, user_id: str, amount: float):
+    _add(db, user_id, {"orders_count": 1, "total_spent": amount or 0.0})
+
+
+def remove_order(db: Session, user_id: str, amount: float):
+    _add(db, user_id, {"orders_count": -1, "total_spent": -(amount or 0.0)})
+
+
+def add_payment(db: Session, user_id: str, count: int, amount: float):
+    # count is +1 when an order becomes paid and -1 when it stops being paid
+    _add(db, user_id, {"paid_count": count, "paid_spent": count * (amount or 0.0)})
+
+
+def rebuild(db: Session) -> int:
+    rows = {}
+    for user_id, count, amount in db.query(
+        models.Order.user_id, func.count(models.Order.id), func.sum(models.Order.total_amount)
+    ).filter(models.Order.user_id.isnot(None)).group_by(models.Order.user_id):
+        rows[user_id] = {"user_id": user_id, "orders_count": count, "total_spent": amount or 0.0,
+                         "paid_count": 0, "paid_spent": 0.0}
+
+    for user_id, count, amount in db.query(
+        models.Order.user_id, func.count(models.Order.id), func.sum(models.Order.total_amount)
+    ).filter(
+        models.Order.user_id.isnot(None),
+        models.Order.status.notin_(models.Order.UNPAID_STATUSES),
+    ).group_by(models.Order.user_id):
+        rows[user_id].update(paid_count=count, paid_spent=amount or 0.0)
+
+    db.query(models.UserStats).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.UserStats, list(rows.values()))
+    db.commit()
+    return len(rows)